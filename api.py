@@ -0,0 +1,160 @@
+import json
+from datetime import datetime, timedelta
+
+from flask import Blueprint, Response, request
+from werkzeug.exceptions import HTTPException
+
+import queries
+from dates import stored_now, to_stored
+from typeahead import typeahead
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is the fallback
+    orjson = None
+
+#----------------------------------------------------------------------------#
+# JSON API v1
+#----------------------------------------------------------------------------#
+
+# GET /api/v1/<resource>                           list, ordered by id
+# GET /api/v1/<resource>/<id>                      one object
+# GET /api/v1/<artists|venues>/<id>/availability   free time between shows
+# GET /api/v1/<artists|venues>/typeahead?q=<prefix> names starting with prefix
+#
+#   fields=id,name,...   only these fields (sparse fieldset); only their columns are selected
+#   ids=1,2,3            batch lookup, one IN query
+#   cursor=<id>          continue after this id; the last page has next_cursor null
+#   limit=<n>            page size, up to MAX_LIMIT
+#
+# Rows are selected as plain columns, never as ORM objects, and handed straight
+# to the encoder.
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+TYPEAHEAD_LIMIT = 10
+MAX_TYPEAHEAD_LIMIT = 50
+
+class APIError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def json_response(data, status=200):
+    if orjson is not None:
+        body = orjson.dumps(data)
+    else:
+        body = json.dumps(data, default=str)
+    return Response(body, status=status, mimetype='application/json')
+
+
+def int_list(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return [int(item) for item in value.split(',')]
+    except ValueError:
+        raise APIError(f'{name} must be a comma separated list of ids')
+
+
+def select(resource):
+    # the query for the requested fields of resource, plus the field names in order
+    model, columns = queries.FIELDS[resource]
+    if request.args.get('fields'):
+        names = request.args['fields'].split(',')
+        unknown = [name for name in names if name not in columns]
+        if unknown:
+            raise APIError(f'unknown fields for {resource}: {", ".join(unknown)}')
+    else:
+        names = list(columns)
+    return model, queries.field_query(resource, names), names
+
+
+#  Endpoints
+#  ----------------------------------------------------------------
+
+@bp.route('/<any(artists, venues, shows):resource>')
+def list_resource(resource):
+    model, query, names = select(resource)
+
+    ids = int_list('ids')
+    if ids is not None:
+        if len(ids) > MAX_LIMIT:
+            raise APIError(f'at most {MAX_LIMIT} ids per request')
+        rows = query.filter(model.id.in_(ids)).order_by(model.id).all()
+        return json_response({'data': [dict(zip(names, row)) for row in rows]})
+
+    limit = max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT))
+    cursor = request.args.get('cursor', type=int)
+    if cursor is not None:
+        query = query.filter(model.id > cursor)
+    # fetch the id alongside so the cursor works with any fieldset
+    rows = query.add_columns(model.id.label('_cursor')).order_by(model.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1][-1]
+    return json_response({
+        'data': [dict(zip(names, row)) for row in rows],
+        'next_cursor': next_cursor,
+    })
+
+
+@bp.route('/<any(artists, venues, shows):resource>/<int:id>')
+def get_resource(resource, id):
+    model, query, names = select(resource)
+    row = query.filter(model.id == id).first()
+    if row is None:
+        raise APIError(f'{resource[:-1]} {id} not found', 404)
+    return json_response({'data': dict(zip(names, row))})
+
+
+@bp.route('/<any(artists, venues):resource>/<int:id>/availability')
+def availability(resource, id):
+    # free time between shows, by default over the next 30 days
+    #   from=, to=        ISO datetimes bounding the window; without an offset
+    #                     they're in the TIMEZONE setting, like show times
+    #   min_minutes=<n>   shortest gap worth listing, default 60
+    model = queries.FIELDS[resource][0]
+    try:
+        start = to_stored(datetime.fromisoformat(request.args['from'])) if 'from' in request.args \
+            else stored_now()
+        end = to_stored(datetime.fromisoformat(request.args['to'])) if 'to' in request.args \
+            else start + timedelta(days=30)
+    except ValueError:
+        raise APIError('from and to must be ISO 8601 datetimes')
+    if end <= start:
+        raise APIError('to must be after from')
+    min_length = timedelta(minutes=max(1, request.args.get('min_minutes', 60, type=int)))
+
+    if queries.field_query(resource, ['id']).filter(model.id == id).first() is None:
+        raise APIError(f'{resource[:-1]} {id} not found', 404)
+    return json_response({'data': queries.free_slots(model, id, start, end, min_length)})
+
+
+@bp.route('/<any(artists, venues):resource>/typeahead')
+def typeahead_view(resource):
+    # for the pickers on the new-show form, see typeahead.py
+    #   q=<prefix>   start of the name, any case
+    #   limit=<n>    at most this many, default 10
+    prefix = request.args.get('q', '')
+    if not prefix.strip():
+        return json_response({'data': []})
+    limit = max(1, min(request.args.get('limit', TYPEAHEAD_LIMIT, type=int), MAX_TYPEAHEAD_LIMIT))
+    return json_response({'data': typeahead.search(queries.FIELDS[resource][0], prefix, limit)})
+
+
+@bp.errorhandler(APIError)
+def api_error(error):
+    return json_response({'error': error.message}, error.status)
+
+
+@bp.errorhandler(HTTPException)
+def http_error(error):
+    return json_response({'error': error.description}, error.code)
@@ -0,0 +1,151 @@
+import traceback
+
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort
+
+import queries
+from http_caching import conditional
+from models import Artist, db
+
+#----------------------------------------------------------------------------#
+# Artists
+#----------------------------------------------------------------------------#
+
+bp = Blueprint('artists', __name__)
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@bp.route('/artists')
+def artists():
+    return conditional(queries.list_freshness(Artist),
+        lambda: render_template('pages/artists.html', artists=queries.artist_list()))
+
+@bp.route('/artists/search', methods=['POST'])
+def search_artists():
+    # ranked search on artist name, genres, city and state, done in the database
+    response = queries.search_artists(request.form.get('search_term', ''),
+        page=max(1, request.form.get('page', 1, type=int)))
+    return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+
+@bp.route('/artists/<int:artist_id>')
+def show_artist(artist_id):
+    # shows the artist page with the given artist_id
+    freshness = queries.artist_freshness(artist_id)
+    if freshness is None:
+        abort(404)
+
+    past_page = max(1, request.args.get('past_page', 1, type=int))
+    return conditional(freshness, lambda: render_template('pages/show_artist.html',
+        artist=queries.artist_detail(artist_id, past_page=past_page)))
+
+#  Update
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+    artist = Artist.query.get(artist_id)
+    from forms import ArtistForm
+    form = ArtistForm()
+    form.name.data = artist.name
+    form.city.data = artist.city
+    form.state.data = artist.state
+    form.genres.data = artist.genres
+    form.phone.data = artist.phone
+    form.facebook_link.data = artist.facebook_link
+    form.website_link.data = artist.website
+    form.image_link.data = artist.image_link
+    form.seeking_venue.data = artist.seeking_venue
+    form.seeking_description.data = artist.seeking_description
+
+
+    # TODO: populate form with fields from artist with ID <artist_id>
+    return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+    # TODO: take values from the form submitted, and update existing
+    # artist record with ID <artist_id> using the new attributes
+    try:
+          from forms import ArtistForm
+          form=ArtistForm()
+          artist = Artist.query.get(artist_id)
+          artist.name = request.form['name']
+          artist.city = request.form['city']
+          artist.state= request.form['state']
+          artist.address = request.form.get('address')
+          artist.genres = request.form.getlist('genres')
+          artist.image_link = request.form.get('image_link')
+
+          if request.form.get('seeking_venue') == 'y':
+              artist.seeking_venue = True
+          else:
+              artist.seeking_venue = False
+
+          artist.seeking_description = request.form.get('seeking_description')
+          artist.facebook_link = request.form.get('facebook_link')
+          artist.phone = request.form.get('phone')
+          artist.website = request.form.get('website_link')
+
+          db.session.commit()
+          flash(f'Edit on {artist.name} was successful')
+
+    except:
+          traceback.print_exc()
+          flash(f'An error occured during editing of {artist.name}')
+
+    return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/create', methods=['POST','GET'])
+# called upon submitting the new artist listing form
+def create_artist_form(): 
+    try:
+        if request.method == 'GET':
+            from forms import ArtistForm
+            form = ArtistForm()
+            return render_template('forms/new_artist.html', form=form)
+
+        elif request.method == 'POST':
+            name = request.form.get('name')
+            city = request.form.get('city')
+            state= request.form.get('state')
+            phone = request.form.get('phone')
+            genres = request.form.getlist('genres')
+            fb = request.form.get('facebook_link')
+            img = request.form.get('image_link')
+
+            if request.form.get('seeking_venue') == 'y':
+                seeking_venue=True
+            else:
+                seeking_venue=False
+
+            seeking_description=request.form.get('seeking_description')
+            web = request.form.get('website_link')
+
+            new_artist = Artist(name=name, city=city, state=state, phone=phone,
+            genres=genres, image_link=img, seeking_venue=seeking_venue,
+            seeking_description=seeking_description, facebook_link=fb, website=web)
+
+            db.session.add(new_artist)
+            db.session.commit()
+
+            #on successful db insert, flash success
+            flash(f"Artist {request.form['name']} was successfully listed!")
+        # TODO: on unsuccessful db insert, flash an error instead.
+    except Exception as e:
+        traceback.print_exc()
+        db.session.rollback()
+        if e.orig.pgcode:
+            if e.orig.pgcode == '23505': # psycopg2 UniqueViolation
+                flash('An error occurred during listing. Phone number already in records.')
+            else:
+                flash('An error occurred during listing')
+        else:
+            flash('An error occurred during listing')
+
+    return render_template('pages/home.html')
+
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion'''
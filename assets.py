@@ -0,0 +1,205 @@
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import current_app, request, send_from_directory, url_for
+
+#----------------------------------------------------------------------------#
+# Assets
+#----------------------------------------------------------------------------#
+
+# `flask fyyur build-assets` copies static/ into static/build/ under names
+# carrying a hash of their contents (css/main.css -> css/main.1f3a9c0b2e.css),
+# writes gzip and brotli copies next to the files worth compressing, cuts the
+# splash photo down to a few widths for srcset, and records it all in
+# static/build/manifest.json.
+#
+# Templates link assets through asset_url('css/main.css'). With a manifest that
+# is the hashed name, served with the best encoding the browser accepts and
+# cached for a year, since the name changes whenever the file does. Without one
+# (a checkout that was never built) it is the plain file, as before.
+#
+# Brotli needs the brotli package and the image variants Pillow; neither is a
+# dependency of the app itself and the build leaves out what it can't make.
+
+BUILD_DIR = 'build'
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 10
+# worth precompressing; images and woff fonts are compressed already
+COMPRESSIBLE = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.eot', '.ttf', '.otf'}
+MIN_COMPRESS_SIZE = 256
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+# images built at these widths for srcset
+RESPONSIVE_IMAGES = {'img/front-splash.jpg': (480, 960, 1440, 1920)}
+IMAGE_QUALITY = 80
+CACHE_MAX_AGE = 365 * 24 * 60 * 60
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+
+def init_app(app):
+    app.extensions['assets'] = load_manifest(app.static_folder)
+    app.jinja_env.globals.update(asset_url=asset_url, asset_srcset=asset_srcset)
+    app.view_functions['static'] = static_view
+
+
+def load_manifest(static_folder):
+    path = os.path.join(static_folder, BUILD_DIR, MANIFEST)
+    if not os.path.exists(path):
+        return {'files': {}, 'srcsets': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def asset_url(filename):
+    files = current_app.extensions['assets']['files']
+    return url_for('static', filename=files.get(filename, filename))
+
+
+def asset_srcset(filename):
+    # "url 480w, url 960w, ..." for the built widths of an image, else ''
+    srcsets = current_app.extensions['assets']['srcsets']
+    return ', '.join(f"{url_for('static', filename=path)} {width}w"
+        for width, path in srcsets.get(filename, ()))
+
+
+def static_view(filename):
+    # built files are served precompressed when the browser accepts it, and
+    # cached for good; everything else as Flask would
+    if not filename.startswith(BUILD_DIR + '/') or filename.endswith('/' + MANIFEST):
+        return current_app.send_static_file(filename)
+
+    directory = current_app.static_folder
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(directory, filename + suffix)):
+            response = send_from_directory(directory, filename + suffix,
+                mimetype=mimetype, max_age=CACHE_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, max_age=CACHE_MAX_AGE)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.immutable = True
+    return response
+
+
+#  Build
+#  ----------------------------------------------------------------
+
+def build(static_folder, clean=False):
+    # builds static/build/ and returns the manifest. files from earlier builds
+    # stay unless clean, so pages rendered before a deploy still find theirs
+    output = os.path.join(static_folder, BUILD_DIR)
+    if clean:
+        shutil.rmtree(output, ignore_errors=True)
+    os.makedirs(output, exist_ok=True)
+
+    files = {}
+    # stylesheets last, so the files their url()s point to are already hashed
+    for name in sorted(sources(static_folder), key=lambda name: name.endswith('.css')):
+        with open(os.path.join(static_folder, name), 'rb') as f:
+            data = f.read()
+        if name.endswith('.css'):
+            data = rewrite_css(name, data.decode('utf-8'), files).encode('utf-8')
+        files[name] = write(static_folder, fingerprint(name, data), data)
+
+    srcsets = {}
+    for name, widths in RESPONSIVE_IMAGES.items():
+        variants = image_variants(static_folder, name, widths)
+        if variants:
+            srcsets[name] = variants
+
+    manifest = {'files': files, 'srcsets': srcsets}
+    with open(os.path.join(output, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def sources(static_folder):
+    # paths under static/, relative and with '/', leaving out the build itself,
+    # dotfiles and unminified copies of files that also come minified
+    names = []
+    for root, dirs, files in os.walk(static_folder):
+        directory = os.path.relpath(root, static_folder).replace(os.sep, '/')
+        if directory == BUILD_DIR:
+            dirs[:] = []
+            continue
+        for file in files:
+            stem, ext = posixpath.splitext(file)
+            if file.startswith('.') or (not stem.endswith('.min') and f'{stem}.min{ext}' in files):
+                continue
+            names.append(file if directory == '.' else f'{directory}/{file}')
+    return sorted(names)
+
+
+def fingerprint(name, data):
+    stem, ext = posixpath.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}'
+
+
+def rewrite_css(name, text, files):
+    # points url()s at the hashed names. the build keeps the layout of static/,
+    # so relative urls stay relative
+    directory = posixpath.dirname(name)
+
+    def replace(match):
+        quote, url = match.groups()
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        target = posixpath.normpath(posixpath.join(directory, path))
+        if target not in files:
+            return match.group(0)
+        relative = posixpath.relpath(files[target], posixpath.join(BUILD_DIR, directory))
+        return f'url({quote}{relative}{suffix}{quote})'
+    return CSS_URL.sub(replace, text)
+
+
+def write(static_folder, name, data):
+    # writes build/name and its compressed copies; returns the path under static/
+    path = os.path.join(static_folder, BUILD_DIR, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    if posixpath.splitext(name)[1] in COMPRESSIBLE and len(data) >= MIN_COMPRESS_SIZE:
+        for suffix, compressed in compressed_copies(data):
+            # only kept when it actually saves something
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as f:
+                    f.write(compressed)
+    return f'{BUILD_DIR}/{name}'
+
+
+def compressed_copies(data):
+    yield '.gz', gzip.compress(data, 9, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        return
+    yield '.br', brotli.compress(data, quality=11)
+
+
+def image_variants(static_folder, name, widths):
+    # [[width, path], ...] for each width narrower than the image itself
+    try:
+        from PIL import Image
+    except ImportError:
+        return []
+    variants = []
+    stem, ext = posixpath.splitext(name)
+    with Image.open(os.path.join(static_folder, name)) as image:
+        for width in widths:
+            if width >= image.width:
+                break
+            height = round(image.height * width / image.width)
+            buffer = io.BytesIO()
+            image.resize((width, height), Image.LANCZOS).save(buffer, format=image.format,
+                quality=IMAGE_QUALITY, optimize=True, progressive=True)
+            data = buffer.getvalue()
+            variants.append([width, write(static_folder, fingerprint(f'{stem}-{width}w{ext}', data), data)])
+    return variants
@@ -0,0 +1,102 @@
+#----------------------------------------------------------------------------#
+# Bulk import benchmark
+#----------------------------------------------------------------------------#
+
+# Rows per second for importing venues with importer.import_rows (validate,
+# COPY into staging, upsert), first into an empty table and then again over the
+# same phone numbers (all updates), next to the old path of one ORM insert and
+# one commit per record.
+#
+# Runs against its own database, which it migrates and empties:
+#   createdb fyyur_bench
+#   BENCH_DATABASE_URL=postgresql://postgres:<password>@localhost:5432/fyyur_bench \
+#       python benchmarks/bulk_import.py
+
+import io
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask
+from flask_migrate import Migrate, upgrade
+
+import importer
+from models import Venue, db
+
+MIGRATIONS = os.path.join(ROOT, 'migrations')
+SIZES = (1000, 10000, 100000)
+# the per-record path is slow enough that a smaller sample says enough
+ORM_ROWS = 1000
+GENRES = ('Jazz', 'Blues', 'Folk', 'Rock n Roll', 'Hip-Hop')
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['BENCH_DATABASE_URL']
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['WTF_CSRF_ENABLED'] = False
+    db.init_app(app)
+    Migrate(app, db)
+    return app
+
+
+def venue_row(i):
+    return {
+        'name': f'Venue {i}',
+        'city': 'San Francisco',
+        'state': 'CA',
+        'address': f'{i} Market St',
+        'phone': f'{i // 10000000 % 1000:03}-{i // 10000 % 1000:03}-{i % 10000:04}',
+        'genres': [GENRES[i % len(GENRES)], GENRES[(i + 2) % len(GENRES)]],
+        'facebook_link': f'https://www.facebook.com/venue{i}',
+        'seeking_talent': i % 2 == 0,
+    }
+
+
+def ndjson(size):
+    return io.StringIO(''.join(json.dumps(venue_row(i)) + '\n' for i in range(size)))
+
+
+def truncate():
+    db.session.execute(db.text('TRUNCATE show, venue RESTART IDENTITY CASCADE'))
+    db.session.commit()
+
+
+def timed_import(size):
+    stream = ndjson(size)
+    start = time.perf_counter()
+    counts = importer.import_rows('venues', importer.read_rows(stream, 'ndjson'))
+    return size / (time.perf_counter() - start), counts
+
+
+def timed_orm(size):
+    start = time.perf_counter()
+    for i in range(size):
+        db.session.add(Venue(**venue_row(i)))
+        db.session.commit()
+    return size / (time.perf_counter() - start)
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        # the schema the app runs on, triggers and all
+        upgrade(directory=MIGRATIONS)
+
+        print(f"{'rows':>8} {'path':>16} {'rows/s':>10}")
+        truncate()
+        print(f"{ORM_ROWS:>8} {'orm per record':>16} {timed_orm(ORM_ROWS):>10.0f}")
+        for size in SIZES:
+            truncate()
+            rate, _ = timed_import(size)
+            print(f"{size:>8} {'import (insert)':>16} {rate:>10.0f}")
+            rate, _ = timed_import(size)
+            print(f"{size:>8} {'import (update)':>16} {rate:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#----------------------------------------------------------------------------#
+# Load test
+#----------------------------------------------------------------------------#
+
+# End-to-end throughput with locust against a running server over a seeded
+# database (see seed.py). Visitors mostly browse listings and detail pages,
+# some search, and a few use the typeahead and the calendar; detail pages are
+# picked from ids fetched through the API when each simulated visitor starts.
+#
+#   pip install locust
+#   gunicorn -c gunicorn.conf.py 'app:create_app()' &
+#   locust -f benchmarks/locustfile.py --host http://localhost:8000 \
+#       --users 200 --spawn-rate 20 --run-time 5m --headless
+#
+# Watch /metrics during the run for where the time goes.
+
+import random
+
+from locust import HttpUser, between, task
+
+SEARCH_TERMS = ('the', 'hop', 'jazz', 'New York', 'velvet', 'Rock n Roll in Austin')
+PREFIXES = ('th', 'the v', 'the m', 'the go', 'th e')
+
+
+class Visitor(HttpUser):
+    wait_time = between(1, 5)
+
+    def on_start(self):
+        self.venue_ids = self.ids('venues')
+        self.artist_ids = self.ids('artists')
+
+    def ids(self, resource):
+        response = self.client.get(f'/api/v1/{resource}?fields=id&limit=500', name=f'/api/v1/{resource}')
+        return [row['id'] for row in response.json()['data']] or [1]
+
+    @task(10)
+    def shows(self):
+        self.client.get('/shows')
+
+    @task(6)
+    def venue(self):
+        self.client.get(f'/venues/{random.choice(self.venue_ids)}', name='/venues/[id]')
+
+    @task(6)
+    def artist(self):
+        self.client.get(f'/artists/{random.choice(self.artist_ids)}', name='/artists/[id]')
+
+    @task(4)
+    def venues(self):
+        self.client.get('/venues')
+
+    @task(3)
+    def artists(self):
+        self.client.get('/artists')
+
+    @task(3)
+    def search(self):
+        resource = random.choice(('venues', 'artists'))
+        self.client.post(f'/{resource}/search', data={'search_term': random.choice(SEARCH_TERMS)},
+            name=f'/{resource}/search')
+
+    @task(2)
+    def typeahead(self):
+        resource = random.choice(('venues', 'artists'))
+        self.client.get(f'/api/v1/{resource}/typeahead', params={'q': random.choice(PREFIXES)},
+            name=f'/api/v1/{resource}/typeahead')
+
+    @task(1)
+    def calendar(self):
+        self.client.get('/shows/calendar', params={'unit': random.choice(('day', 'week', 'month'))},
+            name='/shows/calendar')
+
+    @task(1)
+    def past_shows(self):
+        self.client.get(f'/venues/{random.choice(self.venue_ids)}?past_page=2', name='/venues/[id]?past_page')
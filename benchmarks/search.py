@@ -0,0 +1,87 @@
+#----------------------------------------------------------------------------#
+# Search benchmark
+#----------------------------------------------------------------------------#
+
+# Times venue/artist name search as the tables grow from 1k to 1M rows.
+# With the trigram indexes in place the timings should stay roughly flat.
+#
+# Runs against its own database, which it migrates, then empties and refills:
+#   createdb fyyur_bench
+#   BENCH_DATABASE_URL=postgresql://postgres:<password>@localhost:5432/fyyur_bench \
+#       python benchmarks/search.py
+
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask
+from flask_migrate import Migrate, upgrade
+
+import queries
+from models import db
+
+MIGRATIONS = os.path.join(ROOT, 'migrations')
+SIZES = (1000, 10000, 100000, 1000000)
+TERMS = ('hop', 'music', 'the wild', 'zz9')
+RUNS = 20
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['BENCH_DATABASE_URL']
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    Migrate(app, db)
+    return app
+
+
+def seed(size):
+    # generate_series keeps the load on the server; names are random words around
+    # a few fixed ones so the search terms match a small, stable fraction of rows
+    db.session.execute(db.text('TRUNCATE show, artist, venue RESTART IDENTITY CASCADE'))
+    for table in ('artist', 'venue'):
+        db.session.execute(db.text(f"""
+            INSERT INTO {table} (name, city, state, seeking_{'venue' if table == 'artist' else 'talent'})
+            SELECT (ARRAY['The Musical Hop', 'Park Square Live Music', 'The Wild Sax Band', 'Guns N Petals'])[1 + i % 4]
+                   || ' ' || md5(i::text), 'San Francisco', 'CA', false
+            FROM generate_series(1, :size) AS i
+        """), {'size': size})
+    db.session.execute(db.text("""
+        INSERT INTO show (artist_id, venue_id, start_time)
+        SELECT 1 + (i * 7919) % :size, 1 + (i * 104729) % :size, now() + (i % 730 - 365) * interval '1 day'
+        FROM generate_series(1, :size) AS i
+    """), {'size': size})
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE'))
+
+
+def timed(fn, *args):
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        # the schema the app runs on, triggers and all
+        upgrade(directory=MIGRATIONS)
+
+        print(f"{'rows':>10} {'term':>10} {'venues ms':>10} {'artists ms':>11}")
+        for size in SIZES:
+            seed(size)
+            for term in TERMS:
+                venues_ms = timed(queries.search_venues, term)
+                artists_ms = timed(queries.search_artists, term)
+                print(f'{size:>10} {term:>10} {venues_ms:>10.2f} {artists_ms:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+#----------------------------------------------------------------------------#
+# Synthetic data generator
+#----------------------------------------------------------------------------#
+
+# Fills an empty, migrated database with artists, venues and shows at
+# production-like volumes for the view benchmarks and the load test. Popularity
+# is skewed (Zipf): a few venues and artists get most of the shows, cities
+# likewise, and shows spread over two years past and one ahead. No two shows
+# overlap at a venue or for an artist, as the exclusion constraints require.
+#
+#   createdb fyyur_bench
+#   DATABASE_URL=postgresql://postgres:<password>@localhost:5432/fyyur_bench flask db upgrade
+#   BENCH_DATABASE_URL=postgresql://postgres:<password>@localhost:5432/fyyur_bench \
+#       python benchmarks/seed.py [--artists 100000] [--venues 20000] [--shows 5000000]
+#
+# Rows go in with COPY, in one transaction. The show triggers are off while
+# shows load; the counts and the table version are brought up to date once at
+# the end.
+
+import argparse
+import csv
+import io
+import itertools
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from importer import copy_value
+from models import db
+
+BATCH_SIZE = 100000
+GENRES = ('Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk', 'Hip-Hop',
+    'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae',
+    'Rock n Roll', 'Soul', 'Other')
+CITIES = (('New York', 'NY'), ('Los Angeles', 'CA'), ('Chicago', 'IL'), ('Houston', 'TX'),
+    ('Phoenix', 'AZ'), ('Philadelphia', 'PA'), ('San Antonio', 'TX'), ('San Diego', 'CA'),
+    ('Dallas', 'TX'), ('San Francisco', 'CA'), ('Austin', 'TX'), ('Seattle', 'WA'),
+    ('Denver', 'CO'), ('Nashville', 'TN'), ('Boston', 'MA'), ('Portland', 'OR'),
+    ('New Orleans', 'LA'), ('Atlanta', 'GA'), ('Detroit', 'MI'), ('Minneapolis', 'MN'))
+ADJECTIVES = ('Velvet', 'Electric', 'Midnight', 'Golden', 'Silver', 'Crimson', 'Wild', 'Lonely',
+    'Neon', 'Broken', 'Rolling', 'Howling', 'Quiet', 'Burning', 'Frozen', 'Wandering', 'Lucky',
+    'Hollow', 'Blue', 'Savage')
+NOUNS = ('Foxes', 'Petals', 'Ravens', 'Engines', 'Saints', 'Wolves', 'Echoes', 'Lanterns',
+    'Rivers', 'Strangers', 'Harbors', 'Comets', 'Ghosts', 'Tigers', 'Pilots', 'Shadows', 'Bells',
+    'Kings', 'Sparrows', 'Machines')
+PLACES = ('Hall', 'Room', 'Lounge', 'Club', 'Theatre', 'Tavern', 'Ballroom', 'Cellar', 'Garden', 'Hop')
+DURATIONS = (60, 90, 120, 150, 180)
+PAST_DAYS = 730
+FUTURE_DAYS = 365
+
+
+def create_app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['BENCH_DATABASE_URL']
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def zipf_weights(size, skew, rng):
+    # cumulative weights for random.choices, over ids in a shuffled order so the
+    # most popular row isn't always id 1
+    ranks = list(range(1, size + 1))
+    rng.shuffle(ranks)
+    return list(itertools.accumulate(1 / rank ** skew for rank in ranks))
+
+
+def phone(i):
+    return f'{200 + i // 10000000 % 800:03}-{i // 10000 % 1000:03}-{i % 10000:04}'
+
+
+def name(rng, *parts):
+    return ' '.join(rng.choice(part) for part in parts)
+
+
+def genres(rng):
+    return rng.sample(GENRES, rng.randint(1, 3))
+
+
+def artist_rows(count, city_weights, rng):
+    for id in range(1, count + 1):
+        city, state = rng.choices(CITIES, cum_weights=city_weights)[0]
+        seeking = rng.random() < 0.3
+        yield (id, f'The {name(rng, ADJECTIVES, NOUNS)}', city, state, phone(id), genres(rng),
+            seeking, 'Looking for shows in the area' if seeking else None,
+            f'https://example.com/artists/{id}', f'https://www.facebook.com/artist{id}',
+            f'https://picsum.photos/seed/artist{id}/300/300')
+
+
+def venue_rows(count, city_weights, rng):
+    for id in range(1, count + 1):
+        city, state = rng.choices(CITIES, cum_weights=city_weights)[0]
+        seeking = rng.random() < 0.3
+        yield (id, f'The {name(rng, ADJECTIVES, PLACES)}', city, state,
+            f'{rng.randint(1, 9999)} {name(rng, NOUNS)} St', phone(id), genres(rng),
+            seeking, 'Booking local acts' if seeking else None,
+            f'https://example.com/venues/{id}', f'https://www.facebook.com/venue{id}',
+            f'https://picsum.photos/seed/venue{id}/300/300')
+
+
+def distinct(ids, limit):
+    return list(dict.fromkeys(ids))[:limit]
+
+
+def show_rows(count, venues, artists, skew, rng):
+    # shows are laid out in time slots far enough apart that no show runs into
+    # the next slot; within a slot each venue and each artist appears at most once
+    venue_weights = zipf_weights(venues, skew, rng)
+    artist_weights = zipf_weights(artists, skew, rng)
+    per_slot = max(1, min(venues, artists) // 8)
+    slots = math.ceil(count / per_slot)
+    start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(days=PAST_DAYS)
+    spacing = max(timedelta(hours=4), timedelta(days=PAST_DAYS + FUTURE_DAYS) / slots)
+    # the latest a show may start after its slot opens and still end before the next
+    slack = int((spacing - timedelta(minutes=max(DURATIONS))).total_seconds() // 900)
+
+    id = 0
+    for slot in itertools.count():
+        slot_start = start + slot * spacing
+        # popular ids come up more than once; draw twice as many and keep the first per_slot distinct
+        venue_ids = distinct(rng.choices(range(1, venues + 1), cum_weights=venue_weights, k=2 * per_slot), per_slot)
+        artist_ids = distinct(rng.choices(range(1, artists + 1), cum_weights=artist_weights, k=2 * per_slot), per_slot)
+        for venue_id, artist_id in zip(venue_ids, artist_ids):
+            id += 1
+            start_time = slot_start + timedelta(minutes=15 * rng.randint(0, slack))
+            yield (id, start_time, rng.choice(DURATIONS), artist_id, venue_id)
+            if id == count:
+                return
+
+
+def copy(cursor, table, columns, rows):
+    # COPY rows in batches; returns how many went in
+    total = 0
+    while True:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        batch = list(itertools.islice(rows, BATCH_SIZE))
+        if not batch:
+            return total
+        writer.writerows([copy_value(value) for value in row] for row in batch)
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        total += len(batch)
+        print(f'\r{table}: {total}', end='', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--artists', type=int, default=100000)
+    parser.add_argument('--venues', type=int, default=20000)
+    parser.add_argument('--shows', type=int, default=5000000)
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent of popularity')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--truncate', action='store_true', help='Empty the tables first.')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    city_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(CITIES) + 1)))
+
+    app = create_app()
+    with app.app_context():
+        connection = db.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            if args.truncate:
+                cursor.execute('TRUNCATE show, venue, artist RESTART IDENTITY CASCADE')
+            cursor.execute('SELECT (SELECT count(*) FROM artist) + (SELECT count(*) FROM venue)')
+            if cursor.fetchone()[0]:
+                sys.exit('The database is not empty; pass --truncate to empty it first.')
+
+            start = time.perf_counter()
+            copy(cursor, 'artist', ('id', 'name', 'city', 'state', 'phone', 'genres', 'seeking_venue',
+                'seeking_description', 'website', 'facebook_link', 'image_link'),
+                artist_rows(args.artists, city_weights, rng))
+            print()
+            copy(cursor, 'venue', ('id', 'name', 'city', 'state', 'address', 'phone', 'genres',
+                'seeking_talent', 'seeking_description', 'website', 'facebook_link', 'image_link'),
+                venue_rows(args.venues, city_weights, rng))
+            print()
+            cursor.execute('ALTER TABLE show DISABLE TRIGGER USER')
+            copy(cursor, 'show', ('id', 'start_time', 'duration', 'artist_id', 'venue_id'),
+                show_rows(args.shows, args.venues, args.artists, args.skew, rng))
+            print()
+            cursor.execute('ALTER TABLE show ENABLE TRIGGER USER')
+            cursor.execute("UPDATE table_version SET version = version + 1, "
+                "changed_at = timezone('utc', clock_timestamp()) WHERE table_name = 'show'")
+            cursor.execute('SELECT show_counts_refresh(ARRAY(SELECT id FROM venue), ARRAY(SELECT id FROM artist))')
+            for table in ('artist', 'venue', 'show'):
+                cursor.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"(SELECT coalesce(max(id), 0) + 1 FROM {table}), false)")
+            cursor.execute('ANALYZE artist, venue, show, venue_show_counts, artist_show_counts')
+            connection.commit()
+            print(f'loaded in {time.perf_counter() - start:.0f} s')
+        finally:
+            connection.close()
+
+
+if __name__ == '__main__':
+    main()
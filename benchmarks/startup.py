@@ -0,0 +1,57 @@
+#----------------------------------------------------------------------------#
+# Startup benchmark
+#----------------------------------------------------------------------------#
+
+# Measures what a fresh worker pays before serving: importing the app module,
+# building it with create_app(), and the first request (which loads templates
+# and opens the first database connection). Each run is a new interpreter.
+#
+#   python benchmarks/startup.py [--runs 10] [--path /venues]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app()
+created = time.perf_counter()
+response = application.test_client().get(sys.argv[1])
+first = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first - created) * 1000,
+    'status': response.status_code,
+}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/')
+    args = parser.parse_args()
+
+    samples = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, '-c', PROBE, args.path], cwd=ROOT,
+            check=True, capture_output=True, text=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f'{args.runs} runs, first request GET {args.path} -> {samples[-1]["status"]}')
+    for key in ('import_ms', 'create_app_ms', 'first_request_ms'):
+        values = [sample[key] for sample in samples]
+        print(f'{key:>18}: median {statistics.median(values):8.1f}  max {max(values):8.1f}')
+
+
+if __name__ == '__main__':
+    main()
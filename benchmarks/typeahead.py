@@ -0,0 +1,70 @@
+#----------------------------------------------------------------------------#
+# Typeahead benchmark
+#----------------------------------------------------------------------------#
+
+# Lookup and update cost of the in-memory prefix index behind
+# /api/v1/<artists|venues>/typeahead, on synthetic names. No database needed:
+# the index is filled directly, the way PrefixIndex.build does after its query.
+#
+#   python benchmarks/typeahead.py [--names 100000] [--lookups 10000]
+
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from typeahead import PrefixIndex, fold
+
+
+def random_name(rng):
+    words = rng.randint(1, 3)
+    return ' '.join(''.join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))).title()
+        for _ in range(words))
+
+
+def timed(fn, items):
+    # per-call times in microseconds
+    samples = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p99 = samples[int(len(samples) * 0.99) - 1]
+    print(f'{label:>22}: median {statistics.median(samples):7.1f} us   p99 {p99:7.1f} us')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--names', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=10000)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    rows = [(id, random_name(rng)) for id in range(1, args.names + 1)]
+    index = PrefixIndex(model=None)
+    start = time.perf_counter()
+    index.entries = sorted((fold(name), id, name) for id, name in rows)
+    index.by_id = {entry[1]: entry for entry in index.entries}
+    print(f'{args.names} names, built in {(time.perf_counter() - start) * 1000:.0f} ms')
+
+    for length in (1, 2, 3):
+        prefixes = [''.join(rng.choices(string.ascii_lowercase, k=length)) for _ in range(args.lookups)]
+        report(f'{length}-letter prefix', timed(lambda prefix: index.search(prefix, 10), prefixes))
+
+    ids = rng.sample(range(1, args.names + 1), min(1000, args.names))
+    report('rename', timed(lambda id: index.put(id, random_name(rng)), ids))
+    report('delete', timed(index.remove, ids))
+
+
+if __name__ == '__main__':
+    main()
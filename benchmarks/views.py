@@ -0,0 +1,112 @@
+#----------------------------------------------------------------------------#
+# View benchmark
+#----------------------------------------------------------------------------#
+
+# Times every page and API view through the Flask test client against a seeded
+# database (see seed.py) and counts the SQL statements each one runs. Each view
+# has a statement budget; with --check the script exits 1 when any view goes
+# over it, so an N+1 or a lost join is caught before a deploy. Detail pages are
+# measured for the venue and artist with the most shows.
+#
+#   BENCH_DATABASE_URL=postgresql://postgres:<password>@localhost:5432/fyyur_bench \
+#       python benchmarks/views.py [--runs 20] [--cache] [--check]
+#
+# The page cache is off unless --cache is given, so the numbers are for the
+# queries themselves. The same budgets are checked on a small database by the
+# test suite (tests/test_views.py).
+
+import argparse
+import datetime
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from cli import capture_statements
+from config import TestingConfig
+from models import Artist, ArtistShowCounts, Venue, VenueShowCounts, db
+
+
+def busiest(model, counts, fk):
+    return db.session.query(model.id).join(counts, fk == model.id).order_by(
+        (counts.upcoming_shows_count + counts.past_shows_count).desc(), model.id).limit(1).scalar()
+
+
+def views(venue_id, artist_id):
+    # (name, method, path, form data, statement budget)
+    today = datetime.date.today().isoformat()
+    return [
+        ('index', 'GET', '/', None, 0),
+        ('venues', 'GET', '/venues', None, 2),
+        ('search_venues', 'POST', '/venues/search', {'search_term': 'the hop'}, 1),
+        ('show_venue', 'GET', f'/venues/{venue_id}', None, 5),
+        ('show_venue past_page=2', 'GET', f'/venues/{venue_id}?past_page=2', None, 5),
+        ('create_venue_form', 'GET', '/venues/create', None, 0),
+        ('edit_venue', 'GET', f'/venues/{venue_id}/edit', None, 1),
+        ('artists', 'GET', '/artists', None, 2),
+        ('search_artists', 'POST', '/artists/search', {'search_term': 'jazz'}, 1),
+        ('show_artist', 'GET', f'/artists/{artist_id}', None, 5),
+        ('create_artist_form', 'GET', '/artists/create', None, 0),
+        ('edit_artist', 'GET', f'/artists/{artist_id}/edit', None, 1),
+        ('shows', 'GET', '/shows', None, 2),
+        ('shows scope=all', 'GET', '/shows?scope=all', None, 2),
+        ('shows genre+city', 'GET', '/shows?genre=Jazz&city=New York', None, 2),
+        ('shows calendar', 'GET', f'/shows/calendar?unit=week&date={today}', None, 2),
+        ('create_shows', 'GET', '/shows/create', None, 0),
+        ('api shows', 'GET', '/api/v1/shows?limit=50', None, 1),
+        ('api venue', 'GET', f'/api/v1/venues/{venue_id}', None, 1),
+        ('api availability', 'GET', f'/api/v1/venues/{venue_id}/availability', None, 2),
+        ('api typeahead', 'GET', '/api/v1/artists/typeahead?q=the v', None, 1),
+    ]
+
+
+def measure(client, method, path, data, runs):
+    # (per-run seconds, most statements in a run), after one warm-up request
+    client.open(path, method=method, data=data)
+    samples, statements = [], 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        run = capture_statements(lambda: client.open(path, method=method, data=data).close())
+        samples.append(time.perf_counter() - start)
+        statements = max(statements, len(run))
+    return samples, statements
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--cache', action='store_true', help='Measure with the page cache on.')
+    parser.add_argument('--check', action='store_true', help='Exit 1 if a view runs more statements than its budget.')
+    args = parser.parse_args()
+
+    class BenchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = os.environ['BENCH_DATABASE_URL']
+        CACHE_TYPE = 'lru' if args.cache else 'null'
+
+    app = create_app(BenchConfig)
+    client = app.test_client()
+    over = []
+    with app.app_context():
+        venue_id = busiest(Venue, VenueShowCounts, VenueShowCounts.venue_id)
+        artist_id = busiest(Artist, ArtistShowCounts, ArtistShowCounts.artist_id)
+
+        print(f"{'view':<24} {'median ms':>10} {'p95 ms':>8} {'queries':>8} {'budget':>7}")
+        for name, method, path, data, budget in views(venue_id, artist_id):
+            samples, statements = measure(client, method, path, data, args.runs)
+            samples.sort()
+            p95 = samples[max(0, int(len(samples) * 0.95) - 1)]
+            flag = '' if statements <= budget else '  over budget'
+            if flag:
+                over.append(name)
+            print(f'{name:<24} {statistics.median(samples) * 1000:>10.1f} {p95 * 1000:>8.1f} '
+                f'{statements:>8} {budget:>7}{flag}')
+
+    if args.check and over:
+        sys.exit(f"over the statement budget: {', '.join(over)}")
+
+
+if __name__ == '__main__':
+    main()
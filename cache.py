@@ -0,0 +1,313 @@
+import functools
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from dates import stored_now
+
+#----------------------------------------------------------------------------#
+# Cache
+#----------------------------------------------------------------------------#
+
+# Read-through cache for the data behind the directory, listing and detail pages.
+#
+# Every cached entry is keyed by the current version of each table it was built
+# from. Committing a change to an artist, venue or show bumps that table's
+# version, so entries built from the old rows are never read again and simply
+# age out. Entries that also depend on the time, such as which shows are still
+# upcoming, record when that next changes and aren't read from then on. Backends
+# only need get/set/incr:
+#
+#   CACHE_TYPE = 'lru'      in-process LRU with TTL (default)
+#   CACHE_TYPE = 'redis'    shared between workers, CACHE_REDIS_URL
+#                           (memory:// for an in-process stand-in, see MemoryRedis)
+#   CACHE_TYPE = 'null'     no caching
+#
+# The in-process backend only sees invalidations from its own process, so with
+# several workers it serves other workers' writes up to CACHE_DEFAULT_TTL late;
+# use redis there.
+
+MISSING = object()
+
+
+class LRUBackend:
+    def __init__(self, max_entries=1024, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.entries = OrderedDict()
+        # versions are kept apart from the entries so eviction can't reset them
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return MISSING
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return MISSING
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (ttl or self.default_ttl)
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get_counters(self, keys):
+        with self.lock:
+            return [self.counters.get(key, 0) for key in keys]
+
+    def incr(self, key):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+            return self.counters[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class MemoryRedis:
+    # the few redis commands RedisBackend uses, in process memory, so the redis
+    # backend and its invalidation can be run without a redis server (tests).
+    # values come back as bytes, as from redis
+    def __init__(self):
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def lookup(self, key):
+        value, expires = self.values.get(key, (None, None))
+        if expires is not None and expires < time.monotonic():
+            del self.values[key]
+            return None
+        return value
+
+    def get(self, key):
+        with self.lock:
+            return self.lookup(key)
+
+    def set(self, key, value, ex=None):
+        if not isinstance(value, bytes):
+            value = str(value).encode()
+        with self.lock:
+            self.values[key] = (value, None if ex is None else time.monotonic() + ex)
+        return True
+
+    def mget(self, keys):
+        with self.lock:
+            return [self.lookup(key) for key in keys]
+
+    def incr(self, key):
+        with self.lock:
+            value = int(self.lookup(key) or 0) + 1
+            _, expires = self.values.get(key, (None, None))
+            self.values[key] = (str(value).encode(), expires)
+            return value
+
+
+class RedisBackend:
+    # works with a redis.Redis client, or anything with the same get/set/mget/incr
+    def __init__(self, client, default_ttl=300, prefix='fyyur:'):
+        self.client = client
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        if url == 'memory://':
+            return cls(MemoryRedis(), **kwargs)
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return MISSING if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or self.default_ttl)
+
+    def get_counters(self, keys):
+        return [int(value or 0) for value in self.client.mget([self.prefix + key for key in keys])]
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def clear(self):
+        # entries expire on their own; bumping versions is how they are invalidated
+        pass
+
+
+class NullBackend:
+    def get(self, key):
+        return MISSING
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def get_counters(self, keys):
+        return [0] * len(keys)
+
+    def incr(self, key):
+        return 0
+
+    def clear(self):
+        pass
+
+
+class Cache:
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.fragments = NullBackend()
+        self.enabled = True
+        self.watching = set()
+        self.hits = 0
+        self.misses = 0
+        # called with True for each hit and False for each miss (see metrics.py)
+        self.listeners = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        cache_type = app.config.get('CACHE_TYPE', 'lru')
+        ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+        if cache_type == 'lru':
+            self.backend = LRUBackend(app.config.get('CACHE_MAX_ENTRIES', 1024), ttl)
+        elif cache_type == 'redis':
+            self.backend = RedisBackend.from_url(app.config['CACHE_REDIS_URL'], default_ttl=ttl)
+        elif cache_type == 'null':
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f'Unknown CACHE_TYPE: {cache_type}')
+        # rendered fragments are many, small and cheap to redo: they get their
+        # own bounded LRU in every process, so a long listing can't evict the
+        # page data and costs no network round trip per tile with redis
+        if cache_type != 'null':
+            self.fragments = LRUBackend(app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 10000), ttl)
+        else:
+            self.fragments = NullBackend()
+        app.extensions['cache'] = self
+
+    #  Versions
+    #  ----------------------------------------------------------------
+
+    def versions(self, tables):
+        return self.backend.get_counters([f'version:{table}' for table in tables])
+
+    def invalidate(self, *tables):
+        # call after writes that bypass the ORM session (bulk loads, raw SQL)
+        for table in tables:
+            self.backend.incr(f'version:{table}')
+
+    #  Reads
+    #  ----------------------------------------------------------------
+
+    def cached(self, depends_on, ttl=None, changes_at=None):
+        # decorator for a query function whose result only depends on its
+        # arguments and on the rows of the depends_on tables. changes_at, for
+        # results that depend on the time too, is called with the result and
+        # the arguments and returns when the result changes without any write
+        # (the next upcoming show starting): a naive datetime in the TIMEZONE
+        # setting, or None
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                versions = ','.join(map(str, self.versions(depends_on)))
+                key = f'{fn.__name__}:{versions}:{args!r}:{sorted(kwargs.items())!r}'
+                value = self.backend.get(key)
+                if value is not MISSING and changes_at is not None:
+                    value, until = value
+                    if until is not None and until <= stored_now():
+                        value = MISSING
+                self.record(value is not MISSING)
+                if value is not MISSING:
+                    return value
+                value = fn(*args, **kwargs)
+                if changes_at is None:
+                    self.backend.set(key, value, ttl)
+                else:
+                    until = changes_at(value, *args, **kwargs)
+                    # already stale, e.g. counts whose recount hasn't run yet
+                    if until is None or until > stored_now():
+                        self.backend.set(key, (value, until), ttl)
+                return value
+            return wrapper
+        return decorator
+
+    def fragment(self, key, render, ttl=None):
+        # a rendered piece of a page. the key names the rows it was rendered
+        # from, updated_at included, so it goes stale without any versions
+        if not self.enabled:
+            return render()
+        value = self.fragments.get(key)
+        self.record(value is not MISSING)
+        if value is not MISSING:
+            return value
+        value = render()
+        self.fragments.set(key, value, ttl)
+        return value
+
+    def record(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        for listener in self.listeners:
+            listener(hit)
+
+    @contextmanager
+    def disabled(self):
+        enabled, self.enabled = self.enabled, False
+        try:
+            yield
+        finally:
+            self.enabled = enabled
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    #  Invalidation
+    #  ----------------------------------------------------------------
+
+    def watch(self, session, models):
+        # bump the version of each table in models that a committed transaction wrote to.
+        # safe to call once per app: the listeners are only registered the first time
+        if id(session) in self.watching:
+            return
+        self.watching.add(id(session))
+        tables = {model.__tablename__ for model in models}
+
+        @event.listens_for(session, 'after_flush')
+        def after_flush(session, flush_context):
+            touched = session.info.setdefault('cache_touched', set())
+            for instance in (*session.new, *session.dirty, *session.deleted):
+                table = getattr(instance, '__tablename__', None)
+                if table in tables:
+                    touched.add(table)
+
+        @event.listens_for(session, 'after_commit')
+        def after_commit(session):
+            self.invalidate(*sorted(session.info.pop('cache_touched', ())))
+
+        @event.listens_for(session, 'after_rollback')
+        def after_rollback(session):
+            session.info.pop('cache_touched', None)
+
+
+cache = Cache()
@@ -0,0 +1,259 @@
+import json
+import os
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event
+
+import assets
+import counters
+import exporter
+import importer
+import queries
+from cache import cache
+from dates import stored_now
+from jobs import queue
+from models import Artist, Job, Show, Venue, VenueShowCounts, db
+
+#----------------------------------------------------------------------------#
+# CLI: flask fyyur ...
+#----------------------------------------------------------------------------#
+
+fyyur_cli = AppGroup('fyyur', help='Fyyur maintenance commands.')
+
+
+#  Query plans
+#  ----------------------------------------------------------------
+
+def view_queries():
+    # (view, callable) pairs covering the queries each view runs
+    venue_id = db.session.query(db.func.min(Venue.id)).scalar()
+    artist_id = db.session.query(db.func.min(Artist.id)).scalar()
+    this_week = queries.calendar_range('week', stored_now().date())[0]
+    return [
+        ('venues', queries.venue_areas),
+        ('search_venues', lambda: queries.search_venues('hop')),
+        ('show_venue', lambda: queries.venue_detail(venue_id)),
+        ('artists', queries.artist_list),
+        ('search_artists', lambda: queries.search_artists('hop')),
+        ('show_artist', lambda: queries.artist_detail(artist_id)),
+        ('shows', lambda: queries.show_page()),
+        ('shows?scope=all', lambda: queries.show_page(upcoming=False)),
+        ('shows/calendar', lambda: queries.calendar_bucket('week', this_week, city='San Francisco')),
+        # the conditional GET validators, read on every request, 304s included
+        ('venues validators', lambda: queries.list_freshness(Venue, Show, VenueShowCounts)),
+        ('show_venue validators', lambda: queries.venue_freshness(venue_id)),
+        ('artists validators', lambda: queries.list_freshness(Artist)),
+        ('show_artist validators', lambda: queries.artist_freshness(artist_id)),
+        ('shows validators', lambda: queries.list_freshness(Show, Artist, Venue)),
+    ]
+
+
+def capture_statements(fn):
+    # run fn and return the (statement, parameters) it sent to the database
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+
+def seq_scans(plan, table):
+    # every Seq Scan node on table in an EXPLAIN (FORMAT JSON) plan tree
+    found = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') == table:
+        found.append(plan)
+    for child in plan.get('Plans', []):
+        found.extend(seq_scans(child, table))
+    return found
+
+
+@fyyur_cli.command('check-plans')
+@click.option('--table', default='show', show_default=True,
+    help='Fail if any view query sequentially scans this table.')
+@click.option('--allow-seqscan', is_flag=True,
+    help='Plan with the current settings instead of disabling sequential scans.')
+def check_plans(table, allow_seqscan):
+    """EXPLAIN every view's queries and fail on a sequential scan.
+
+    Run against a seeded local database. By default sequential scans are
+    disabled for the planning session (enable_seqscan = off), so a Seq Scan
+    that still shows up means no index can serve the query, whatever the
+    table sizes are.
+    """
+    failures = 0
+    for view, fn in view_queries():
+        with cache.disabled():
+            statements = capture_statements(fn)
+        for statement, parameters in statements:
+            connection = db.session.connection()
+            if not allow_seqscan:
+                connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+            result = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+            plan = result.scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            scans = seq_scans(plan[0]['Plan'], table)
+            status = 'SEQ SCAN' if scans else 'ok'
+            click.echo(f'{status:8} {view}: {" ".join(statement.split())[:100]}')
+            failures += bool(scans)
+        db.session.rollback()
+
+    if failures:
+        queries_text = '1 query scans' if failures == 1 else f'{failures} queries scan'
+        raise click.ClickException(f'{queries_text} {table} sequentially')
+
+
+#  Bulk import
+#  ----------------------------------------------------------------
+
+@fyyur_cli.command('import')
+@click.argument('resource', type=click.Choice(sorted(importer.RESOURCES)))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'format', type=click.Choice(['csv', 'ndjson']),
+    help='Input format; by default taken from the file extension.')
+@click.option('--batch-size', default=importer.BATCH_SIZE, show_default=True,
+    help='Rows loaded and committed together.')
+@click.option('--rejects', type=click.File('w', encoding='utf-8'),
+    help='Write rejected rows here as NDJSON, with their line number and errors.')
+def import_command(resource, source, format, batch_size, rejects):
+    """Load venues, artists or shows from a CSV or NDJSON file ('-' for stdin).
+
+    Rows are validated like the create forms, then COPYed into the database in
+    batches. Venues and artists that match an existing phone number update it.
+    """
+    if format is None:
+        format = 'ndjson' if source.name.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+    shown = []
+
+    def on_reject(line, row, errors):
+        if rejects:
+            rejects.write(json.dumps({'line': line, 'errors': errors, 'row': row}, default=str) + '\n')
+        elif len(shown) < 10:
+            shown.append(line)
+            click.echo(f'line {line}: {errors}', err=True)
+
+    start = time.perf_counter()
+    counts = importer.import_rows(resource, importer.read_rows(source, format), batch_size, on_reject)
+    elapsed = time.perf_counter() - start
+    click.echo(f"{counts['read']} rows: {counts['inserted']} inserted, {counts['updated']} updated, "
+        f"{counts['rejected']} rejected in {elapsed:.2f}s ({counts['read'] / elapsed:.0f} rows/s)")
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+@fyyur_cli.command('export')
+@click.argument('resource', type=click.Choice(sorted(queries.FIELDS)))
+@click.option('-o', '--output', type=click.Path(dir_okay=False, writable=True),
+    help='File to write; stdout by default.')
+@click.option('--format', 'format', type=click.Choice(exporter.FORMATS),
+    help='Output format; by default taken from the output file name, else csv.')
+@click.option('--gzip', is_flag=True, help='Gzip the output (implied by a .gz output name).')
+def export_command(resource, output, format, gzip):
+    """Stream every venue, artist or show to CSV, NDJSON or Parquet."""
+    name = output or ''
+    if name.endswith('.gz'):
+        gzip = True
+        name = name[:-len('.gz')]
+    if format is None:
+        format = next((f for f in exporter.FORMATS if name.endswith('.' + f)), 'csv')
+
+    try:
+        chunks = exporter.export(resource, format, gzip)
+    except exporter.ExportError as error:
+        raise click.ClickException(str(error))
+    with click.open_file(output or '-', 'wb') as stream:
+        for chunk in chunks:
+            stream.write(chunk)
+
+
+#  Show counters
+#  ----------------------------------------------------------------
+
+@fyyur_cli.command('refresh-counts')
+@click.option('--all', 'everything', is_flag=True,
+    help='Recount every venue and artist, not only those whose next show has started.')
+def refresh_counts(everything):
+    """Recount upcoming/past shows for venues and artists with shows that have started.
+
+    Inserts, updates and deletes of shows keep the counts current by
+    themselves, and the worker recounts when a show listed through the app
+    starts; this catches shows passing from upcoming to past that were loaded
+    in bulk. Run it every few minutes, e.g. from cron.
+    """
+    venues, artists = counters.refresh(everything)
+    click.echo(f'recounted {venues} venues and {artists} artists')
+
+
+#  Background jobs
+#  ----------------------------------------------------------------
+
+@fyyur_cli.command('worker')
+@click.option('--burst', is_flag=True, help='Exit once no job is due instead of waiting for more.')
+def worker(burst):
+    """Run queued background jobs until stopped.
+
+    Start as many as you like, on any machine that can reach the database;
+    each job runs once. SIGTERM or Ctrl-C lets the current job finish first.
+    """
+    done = queue.work(burst)
+    click.echo(f'ran {done} jobs')
+
+
+@fyyur_cli.command('jobs')
+@click.option('--retry', is_flag=True, help='Queue the failed jobs again, with their attempts reset.')
+def jobs(retry):
+    """Count queued, running and failed jobs, and show why jobs failed."""
+    if retry:
+        # not those whose key has been queued again since
+        queued = db.aliased(Job)
+        retried = Job.query.filter(Job.status == 'failed', ~db.exists().where(
+            queued.key == Job.key, queued.status == 'queued')).update(
+            {'status': 'queued', 'attempts': 0, 'locked_by': None, 'run_at': db.func.now()},
+            synchronize_session=False)
+        db.session.commit()
+        click.echo(f'queued {retried} failed jobs again')
+        return
+
+    running = db.and_(Job.status == 'queued', Job.locked_by.isnot(None))
+    state = db.case((running, 'running'), else_=Job.status)
+    for task, status, count in db.session.query(Job.task, state, db.func.count()).group_by(
+            Job.task, state).order_by(Job.task, state):
+        click.echo(f'{count:8} {status:8} {task}')
+    for job in Job.query.filter_by(status='failed').order_by(Job.id.desc()).limit(10):
+        error = (job.last_error or '').strip().splitlines()
+        click.echo(f'job {job.id} ({job.task}, {job.attempts} attempts): {error[-1] if error else ""}')
+
+
+#  Static assets
+#  ----------------------------------------------------------------
+
+@fyyur_cli.command('build-assets')
+@click.option('--clean', is_flag=True, help='Remove earlier builds first.')
+def build_assets(clean):
+    """Fingerprint, precompress and resize static files into static/build.
+
+    Restart the app afterwards so it loads the new manifest. Without brotli or
+    Pillow installed, the .br copies or the image variants are left out.
+    """
+    static_folder = current_app.static_folder
+    manifest = assets.build(static_folder, clean)
+    size = sent = 0
+    for path in manifest['files'].values():
+        sizes = [os.path.getsize(os.path.join(static_folder, path + suffix))
+            for suffix in ('', '.gz', '.br') if os.path.exists(os.path.join(static_folder, path + suffix))]
+        size += sizes[0]
+        sent += min(sizes)
+    click.echo(f"built {len(manifest['files'])} files, {size // 1024} KB "
+        f"({sent // 1024} KB compressed), {len(manifest['srcsets'])} responsive images")
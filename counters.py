@@ -0,0 +1,44 @@
+from cache import cache
+from jobs import queue
+from models import Artist, Venue, VenueShowCounts, ArtistShowCounts, db
+
+#----------------------------------------------------------------------------#
+# Show counters
+#----------------------------------------------------------------------------#
+
+# venue_show_counts and artist_show_counts hold each venue's and artist's
+# upcoming and past show counts. Triggers on show recount whatever a write
+# touches (see the e7b2c5d8a134 migration), but a show moving from upcoming to
+# past is no write at all. next_show_at records when that happens next, and
+# refresh() recounts the rows it has passed. Listing a show queues it as a
+# job for the show's start (see jobs.py); `flask fyyur refresh-counts` runs it
+# too, for shows loaded in bulk; schedule that every few minutes.
+
+
+@queue.task('refresh_counts')
+def refresh(everything=False):
+    # recount the venues and artists whose next show has started, or all of
+    # them; returns how many of each were recounted
+    if everything:
+        venue_ids = [id for id, in db.session.query(Venue.id)]
+        artist_ids = [id for id, in db.session.query(Artist.id)]
+    else:
+        venue_ids = [id for id, in db.session.query(VenueShowCounts.venue_id
+            ).filter(VenueShowCounts.next_show_at <= db.func.now())]
+        artist_ids = [id for id, in db.session.query(ArtistShowCounts.artist_id
+            ).filter(ArtistShowCounts.next_show_at <= db.func.now())]
+
+    if venue_ids or artist_ids:
+        db.session.execute(db.text('SELECT show_counts_refresh(:venue_ids, :artist_ids)'),
+            {'venue_ids': venue_ids, 'artist_ids': artist_ids})
+        db.session.commit()
+        # the pages built from the old counts. this only reaches the worker's own
+        # process with the lru backend; web processes stop reading theirs once
+        # next_show_at has passed (see queries.detail_changes_at)
+        cache.invalidate('venue_show_counts', 'artist_show_counts')
+    return len(venue_ids), len(artist_ids)
+
+
+def refresh_at(start_time):
+    # queue a refresh for when a show starts; shows starting together share one
+    queue.enqueue('refresh_counts', run_at=start_time, key=f'refresh_counts:{start_time}')
@@ -0,0 +1,116 @@
+import functools
+from datetime import datetime, timezone
+
+from flask import current_app, has_request_context, request
+from sqlalchemy import event
+
+#----------------------------------------------------------------------------#
+# Dates
+#----------------------------------------------------------------------------#
+
+# The |datetime template filter. Views pass datetimes straight from the
+# database; strings are still parsed for older callers. Babel patterns are
+# parsed once per format and locale objects loaded once per name, so a page
+# with hundreds of shows only pays for the formatting itself.
+#
+# Naive datetimes are taken to be in the TIMEZONE setting (what start_time
+# is entered in) and shown in the user's timezone, which the layout stores in
+# the 'tz' cookie. Without the cookie they're shown as stored. The database
+# sessions use the TIMEZONE setting too (init_app), so start_time > now()
+# compares the same instants in SQL as stored_now() does in Python.
+#
+# The calendar is bucketed by day and hour in the TIMEZONE setting, so its
+# labels are formatted as stored: shifting midnight west would put a week
+# starting Monday on the Sunday before.
+
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+TIMEZONE_COOKIE = 'tz'
+
+
+@functools.lru_cache(maxsize=None)
+def pattern(format):
+    # 'full', 'medium' or a Babel pattern such as "EEEE d MMMM"
+    from babel.dates import parse_pattern
+    return parse_pattern(FORMATS.get(format, format))
+
+
+@functools.lru_cache(maxsize=None)
+def locale(name):
+    from babel import Locale
+    return Locale.parse(name)
+
+
+@functools.lru_cache(maxsize=256)
+def zone(name):
+    # the ZoneInfo for an IANA name, or None when there's no such zone
+    from zoneinfo import ZoneInfo
+    try:
+        return ZoneInfo(name)
+    except (ValueError, LookupError, OSError):
+        return None
+
+
+def stored_timezone_name(config):
+    name = config.get('TIMEZONE', 'UTC')
+    return name if zone(name) is not None else 'UTC'
+
+
+def stored_timezone():
+    # the zone naive start_times are in
+    return zone(stored_timezone_name(current_app.config))
+
+
+def stored_now():
+    # the current time as start_time would store it
+    return datetime.now(stored_timezone()).replace(tzinfo=None)
+
+
+def to_stored(value):
+    # value as start_time would store it: naive, in the TIMEZONE setting.
+    # naive values are taken to be that already
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(stored_timezone()).replace(tzinfo=None)
+
+
+def user_timezone():
+    # the name of a valid zone from the user's cookie, else None
+    if not has_request_context():
+        return None
+    name = request.cookies.get(TIMEZONE_COOKIE)
+    return name if name and zone(name) is not None else None
+
+
+def format_datetime(value, format='medium', locale_name='en', convert=True):
+    # convert=False formats value as stored, for the calendar's labels
+    if value is None or value == '':
+        return ''
+    if isinstance(value, str):
+        import dateutil.parser
+        value = dateutil.parser.parse(value)
+
+    user_zone = user_timezone() if convert else None
+    if user_zone is not None:
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=stored_timezone())
+        value = value.astimezone(zone(user_zone))
+    return pattern(format).apply(value, locale(locale_name))
+
+
+def init_app(app, engine):
+    # Postgres compares a naive timestamp with now() by reading it in the
+    # session's TimeZone, so every connection gets the TIMEZONE setting
+    name = stored_timezone_name(app.config)
+
+    @event.listens_for(engine, 'connect')
+    def set_timezone(dbapi_connection, connection_record):
+        # outside a transaction, or the pool's rollback would undo it
+        autocommit = dbapi_connection.autocommit
+        dbapi_connection.autocommit = True
+        cursor = dbapi_connection.cursor()
+        cursor.execute('SET TIME ZONE %s', (name,))
+        cursor.close()
+        dbapi_connection.autocommit = autocommit
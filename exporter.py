@@ -0,0 +1,197 @@
+import csv
+import hmac
+import io
+import json
+import zlib
+
+from flask import Blueprint, Response, abort, current_app, request, stream_with_context
+
+import queries
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is the fallback
+    orjson = None
+
+#----------------------------------------------------------------------------#
+# Export
+#----------------------------------------------------------------------------#
+
+# Streams a whole table, shows with their artist and venue names, as CSV,
+# NDJSON or Parquet, optionally gzipped. Rows are read in batches of
+# EXPORT_BATCH_SIZE through a server-side cursor and each batch is encoded and
+# sent before the next is read, so memory stays flat however big the table is.
+#
+#   flask fyyur export venues -o venues.csv.gz
+#   curl -H 'Authorization: Bearer <EXPORT_TOKEN>' '.../export/shows?format=ndjson&gzip=1'
+#
+# Parquet needs pyarrow, which is not a dependency of the app itself.
+
+EXPORT_BATCH_SIZE = 5000
+FORMATS = ('csv', 'ndjson', 'parquet')
+MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+bp = Blueprint('export', __name__)
+
+
+class ExportError(Exception):
+    pass
+
+
+def batches(resource):
+    # (field names, iterator over lists of row tuples), ordered by id
+    model, columns = queries.FIELDS[resource]
+    names = list(columns)
+    query = queries.field_query(resource, names).order_by(model.id)
+
+    def fetch():
+        batch = []
+        for row in query.yield_per(EXPORT_BATCH_SIZE):
+            batch.append(tuple(row))
+            if len(batch) == EXPORT_BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    return names, fetch()
+
+
+#  Encoders
+#  ----------------------------------------------------------------
+
+# each takes (names, batches) and yields bytes
+
+def csv_value(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, list):
+        # same form the importer reads back
+        return ','.join(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def encode_csv(names, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+    for batch in batches:
+        writer.writerows([csv_value(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def encode_ndjson(names, batches):
+    for batch in batches:
+        if orjson is not None:
+            lines = [orjson.dumps(dict(zip(names, row))) for row in batch]
+        else:
+            lines = [json.dumps(dict(zip(names, row)), default=str).encode('utf-8') for row in batch]
+        yield b'\n'.join(lines) + b'\n'
+
+
+def parquet_schema(resource, names):
+    import pyarrow as pa
+    types = {'INTEGER': pa.int64(), 'BOOLEAN': pa.bool_(), 'DATETIME': pa.timestamp('us')}
+    columns = queries.FIELDS[resource][1]
+    fields = []
+    for name in names:
+        column_type = columns[name].type
+        if column_type.__visit_name__ == 'ARRAY':
+            fields.append(pa.field(name, pa.list_(pa.string())))
+        else:
+            fields.append(pa.field(name, types.get(column_type.__visit_name__.upper(), pa.string())))
+    return pa.schema(fields)
+
+
+def encode_parquet(resource, names, batches):
+    # one row group per batch, written to a buffer that is emptied after each
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = parquet_schema(resource, names)
+    buffer = io.BytesIO()
+    writer = pq.ParquetWriter(buffer, schema)
+    for batch in batches:
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(zip(*batch), schema)],
+            schema=schema))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    writer.close()
+    yield buffer.getvalue()
+
+
+def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export(resource, format, gzip=False):
+    # bytes chunks of the export of resource; raises ExportError up front
+    # rather than halfway through a stream
+    if resource not in queries.FIELDS:
+        raise ExportError(f'Unknown resource: {resource}')
+    if format not in FORMATS:
+        raise ExportError(f'Unknown export format: {format}')
+    if format == 'parquet':
+        try:
+            import pyarrow.parquet  # noqa: F401
+        except ImportError:
+            raise ExportError('Parquet export needs pyarrow: pip install pyarrow')
+
+    names, rows = batches(resource)
+    if format == 'csv':
+        chunks = encode_csv(names, rows)
+    elif format == 'ndjson':
+        chunks = encode_ndjson(names, rows)
+    else:
+        chunks = encode_parquet(resource, names, rows)
+    return gzipped(chunks) if gzip else chunks
+
+
+def filename(resource, format, gzip=False):
+    return f'{resource}.{format}' + ('.gz' if gzip else '')
+
+
+#  Endpoint
+#  ----------------------------------------------------------------
+
+def authorized():
+    # a bearer token matching EXPORT_TOKEN; with no token configured, nobody is
+    token = current_app.config.get('EXPORT_TOKEN')
+    header = request.headers.get('Authorization', '')
+    if not token or not header.startswith('Bearer '):
+        return False
+    return hmac.compare_digest(header[len('Bearer '):].encode(), token.encode())
+
+
+@bp.route('/export/<resource>')
+def export_view(resource):
+    #   ?format=csv|ndjson|parquet   default csv
+    #   ?gzip=1                      gzip the file on the fly
+    if not authorized():
+        return Response('Unauthorized', 401, {'WWW-Authenticate': 'Bearer'})
+    format = request.args.get('format', 'csv')
+    gzip = bool(request.args.get('gzip'))
+    try:
+        chunks = export(resource, format, gzip)
+    except ExportError:
+        abort(404 if resource not in queries.FIELDS else 400)
+
+    response = Response(stream_with_context(chunks),
+        mimetype='application/gzip' if gzip else MIMETYPES[format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename(resource, format, gzip)}"'
+    return response
@@ -5,9 +5,11 @@ from fabric.contrib.console import confirm
 
 
 def test():
+    # the test suite, query budgets included, against TEST_DATABASE_URL
+    # (see tests/conftest.py), then index use against the local database
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m pytest -q && flask fyyur check-plans", capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
@@ -40,7 +42,7 @@ def heroku():
 
 def heroku_test():
     local(
-        "heroku run python test_tasks.py -v && heroku run python test_users.py -v"
+        "heroku run flask fyyur check-plans"
     )
 
 
@@ -1,15 +1,22 @@
 from flask_wtf import Form
 from datetime import datetime
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL, Regexp, ValidationError
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, Regexp, ValidationError, NumberRange
 import re
 
 
 
 class ShowForm(Form):
+    # the name fields only drive the typeahead pickers, which fill in the ids
+    artist_name = StringField(
+        'artist_name'
+    )
     artist_id = StringField(
         'artist_id'
     )
+    venue_name = StringField(
+        'venue_name'
+    )
     venue_id = StringField(
         'venue_id'
     )
@@ -18,6 +25,12 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    duration = IntegerField(
+        # minutes
+        'duration',
+        validators=[DataRequired(), NumberRange(min=1)],
+        default=120
+    )
 
 class VenueForm(Form):
     name = StringField(
@@ -0,0 +1,53 @@
+import os
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from cache import cache
+from dates import user_timezone
+
+#----------------------------------------------------------------------------#
+# Templates
+#----------------------------------------------------------------------------#
+
+# Compiled templates are kept on disk in JINJA_BYTECODE_CACHE_DIR, so a worker
+# that has just started loads them instead of parsing every template again.
+# Entries are keyed by template name and a checksum of its source, so an edited
+# template is recompiled; workers sharing the directory share the work.
+#
+# {% cache %} renders its body once and reuses it until a key part changes:
+#
+#   {% cache 'venue', venue.id, venue.updated_at %} ... {% endcache %}
+#
+# Fragments live in a bounded LRU of their own in each process (see cache.py),
+# keyed by the template name, the key parts and the visitor's timezone, since
+# show times are shown in it. Templates rendered with fragment_cache=False,
+# such as the streamed /shows, render every body instead: a whole history
+# would only push everything else out.
+
+
+def init_app(app):
+    directory = app.config.get('JINJA_BYTECODE_CACHE_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+    app.jinja_env.add_extension(FragmentCacheExtension)
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        args = [nodes.Const(parser.name), nodes.ContextReference(), nodes.List(parts)]
+        return nodes.CallBlock(self.call_method('render', args), [], [], body).set_lineno(lineno)
+
+    def render(self, template, context, parts, caller):
+        if context.get('fragment_cache') is False:
+            return caller()
+        key = ':'.join(map(str, (template, *parts, user_timezone() or '')))
+        return cache.fragment(key, caller)
@@ -0,0 +1,23 @@
+import os
+import shutil
+import tempfile
+
+# gunicorn -c gunicorn.conf.py 'app:create_app()'
+#
+# Workers write their metrics to files in PROMETHEUS_MULTIPROC_DIR so /metrics
+# can add them up (see metrics.py). It is set here, before any worker imports
+# prometheus_client, emptied when gunicorn starts, and a worker's live gauges
+# are dropped when it exits.
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'fyyur-metrics'))
+
+
+def on_starting(server):
+    directory = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,30 @@
+import hashlib
+
+from flask import request, Response, make_response, session
+from werkzeug.http import is_resource_modified
+
+from dates import user_timezone
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+def conditional(validators, render):
+    # validators come from queries.py. When the client's If-None-Match still
+    # matches, answer 304 without calling render. Pages with flash messages
+    # waiting are always rendered. There's no Last-Modified: no single time
+    # covers a show being deleted or a show starting, and a client sending
+    # only If-Modified-Since would be told a changed page hadn't changed.
+
+    # times are rendered in the visitor's timezone, so it is part of the page
+    etag = hashlib.sha1(repr((validators, user_timezone())).encode()).hexdigest()
+
+    if '_flashes' not in session and not is_resource_modified(request.environ, etag=etag):
+        response = Response(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    # browsers and the CDN may keep the page, but have to revalidate it
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response
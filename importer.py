@@ -0,0 +1,285 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from werkzeug.datastructures import MultiDict
+
+from cache import cache
+from dates import to_stored
+from models import Artist, Venue, Show, db
+
+#----------------------------------------------------------------------------#
+# Bulk import
+#----------------------------------------------------------------------------#
+
+# Loads partner feeds of venues, artists or shows (CSV with a header row, or
+# NDJSON) without going through one form post and one commit per record:
+#
+#   1. rows are streamed from the input and validated with the same form class
+#      the create pages use (VenueForm, ArtistForm, ShowForm)
+#   2. every BATCH_SIZE valid rows are COPYed into a temporary staging table
+#   3. one INSERT ... SELECT moves the batch into the real table. venues and
+#      artists are upserted on their unique phone; shows whose artist or venue
+#      doesn't exist, or that overlap another booking of either, are rejected
+#   4. the batch is committed, which also empties the staging table
+#
+# Rows that fail validation are handed back with their line number and errors.
+# Used by `flask fyyur import`.
+
+BATCH_SIZE = 5000
+
+# resource -> (model, form class name, columns loaded, in COPY order)
+RESOURCES = {
+    'venues': (Venue, 'VenueForm', ('name', 'city', 'state', 'address', 'phone', 'genres',
+        'image_link', 'facebook_link', 'website', 'seeking_talent', 'seeking_description')),
+    'artists': (Artist, 'ArtistForm', ('name', 'city', 'state', 'phone', 'genres',
+        'image_link', 'facebook_link', 'website', 'seeking_venue', 'seeking_description')),
+    'shows': (Show, 'ShowForm', ('artist_id', 'venue_id', 'start_time', 'duration')),
+}
+
+# input key -> form field, where they differ
+FORM_FIELDS = {'website': 'website_link'}
+
+
+#  Reading
+#  ----------------------------------------------------------------
+
+def read_rows(stream, format):
+    # yield (line number, row dict) from a text stream
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif format == 'ndjson':
+        for line, text in enumerate(stream, 1):
+            if text.strip():
+                yield line, json.loads(text)
+    else:
+        raise ValueError(f'Unknown import format: {format}')
+
+
+def form_data(row):
+    # a row as the form post the create page would send
+    data = MultiDict()
+    for key, value in row.items():
+        key = FORM_FIELDS.get(key, key)
+        if value is None or value is False or value == '':
+            continue
+        if value is True:
+            value = 'y'
+        if key == 'genres':
+            if isinstance(value, str):
+                # CSV cells hold "Jazz,Blues" or a postgres array literal "{Jazz,Blues}"
+                value = [genre.strip() for genre in value.strip('{}').split(',') if genre.strip()]
+            for genre in value:
+                data.add(key, genre)
+        else:
+            data.add(key, str(value))
+    return data
+
+
+#  Validation
+#  ----------------------------------------------------------------
+
+def new_form(resource):
+    import forms
+    return getattr(forms, RESOURCES[resource][1])(formdata=None, meta={'csrf': False})
+
+
+def validate(resource, row, form=None):
+    # (record, None) for a valid row, (None, errors) otherwise. binding a form's
+    # fields costs more than validating them, so pass one form from new_form()
+    # to reuse it for every row
+    columns = RESOURCES[resource][2]
+    if form is None:
+        form = new_form(resource)
+    start_time_error = None
+    if resource == 'shows' and row.get('start_time'):
+        # feeds, and `flask fyyur export`, write any ISO 8601 datetime, where the
+        # form only reads the create page's '%Y-%m-%d %H:%M:%S'
+        try:
+            start_time = to_stored(datetime.fromisoformat(str(row['start_time'])))
+            row = dict(row, start_time=start_time.strftime('%Y-%m-%d %H:%M:%S'))
+        except ValueError:
+            start_time_error = ['Not a valid ISO 8601 datetime.']
+    form.process(form_data(row))
+    form.validate()
+    errors = dict(form.errors)
+
+    if resource == 'shows':
+        # ShowForm leaves these to the view; the ids must at least be ids
+        for key in ('artist_id', 'venue_id'):
+            try:
+                int(row.get(key))
+            except (TypeError, ValueError):
+                errors[key] = ['Not a valid id.']
+        if start_time_error:
+            errors['start_time'] = start_time_error
+        elif not row.get('start_time'):
+            errors['start_time'] = ['This field is required.']
+    if errors:
+        return None, errors
+
+    record = {}
+    for column in columns:
+        value = form[FORM_FIELDS.get(column, column)].data
+        record[column] = None if value == '' else value
+    return record, None
+
+
+#  Loading
+#  ----------------------------------------------------------------
+
+def pg_array(values):
+    # text form of a postgres array, as COPY reads it
+    items = ('"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"' for value in values)
+    return '{' + ','.join(items) + '}'
+
+
+def copy_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, list):
+        return pg_array(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def staging_table(cursor, model, columns):
+    # per-connection temp table, created on first use and emptied by every commit
+    name = f'import_{model.__tablename__}'
+    dialect = db.engine.dialect
+    definitions = ', '.join(
+        f'{column} {model.__table__.c[column].type.compile(dialect=dialect)}' for column in columns)
+    cursor.execute(f'CREATE TEMP TABLE IF NOT EXISTS {name} '
+        f'(line integer, {definitions}) ON COMMIT DELETE ROWS')
+    return name
+
+
+def load_batch(resource, batch):
+    # COPY (line, record) pairs into staging, move them into the table and commit.
+    # returns (inserted, updated, [(line, errors)] rejected by the database)
+    model, form_name, columns = RESOURCES[resource]
+    table = model.__tablename__
+    cursor = db.session.connection().connection.cursor()
+    staging = staging_table(cursor, model, columns)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for line, record in batch:
+        writer.writerow([line, *(copy_value(record[column]) for column in columns)])
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {staging} (line, {', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+    column_list = ', '.join(columns)
+    rejected = []
+    if resource == 'shows':
+        # missing artists or venues, and bookings overlapping an existing show, or
+        # an earlier-starting row of the batch, at the same venue or with the same artist
+        cursor.execute(f"""
+            WITH s AS (
+                SELECT *, tsrange(start_time, start_time + duration * interval '1 minute') AS period,
+                       max(start_time + duration * interval '1 minute') OVER (PARTITION BY venue_id
+                           ORDER BY start_time, line ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING)
+                           > start_time AS venue_clash,
+                       max(start_time + duration * interval '1 minute') OVER (PARTITION BY artist_id
+                           ORDER BY start_time, line ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING)
+                           > start_time AS artist_clash
+                FROM {staging}
+            )
+            SELECT line,
+                   EXISTS (SELECT 1 FROM artist WHERE id = s.artist_id),
+                   EXISTS (SELECT 1 FROM venue WHERE id = s.venue_id),
+                   coalesce(venue_clash, false) OR EXISTS (SELECT 1 FROM show
+                       WHERE venue_id = s.venue_id AND start_time IS NOT NULL
+                         AND tsrange(start_time, end_time) && s.period),
+                   coalesce(artist_clash, false) OR EXISTS (SELECT 1 FROM show
+                       WHERE artist_id = s.artist_id AND start_time IS NOT NULL
+                         AND tsrange(start_time, end_time) && s.period)
+            FROM s
+        """)
+        for line, artist_exists, venue_exists, venue_booked, artist_booked in cursor.fetchall():
+            errors = {}
+            if not artist_exists:
+                errors['artist_id'] = ['No such artist.']
+            if not venue_exists:
+                errors['venue_id'] = ['No such venue.']
+            if venue_booked:
+                errors.setdefault('start_time', []).append('The venue is already booked at that time.')
+            if artist_booked:
+                errors.setdefault('start_time', []).append('The artist is already booked at that time.')
+            if errors:
+                rejected.append((line, errors))
+        cursor.execute(f"DELETE FROM {staging} WHERE line = ANY(%s)", ([line for line, errors in rejected],))
+        # DO NOTHING skips rows that only started to conflict since the check
+        cursor.execute(f"""
+            INSERT INTO show ({column_list})
+            SELECT {column_list} FROM {staging}
+            ON CONFLICT DO NOTHING
+        """)
+        inserted, updated = cursor.rowcount, 0
+    else:
+        assignments = ', '.join(f'{column} = EXCLUDED.{column}' for column in columns if column != 'phone')
+        # xmax is 0 only on freshly inserted rows
+        cursor.execute(f"""
+            INSERT INTO {table} ({column_list})
+            SELECT {column_list} FROM {staging}
+            ON CONFLICT (phone) DO UPDATE SET {assignments}, updated_at = timezone('utc', now())
+            RETURNING xmax = 0
+        """)
+        results = [row[0] for row in cursor.fetchall()]
+        inserted = sum(results)
+        updated = len(results) - inserted
+
+    db.session.commit()
+    return inserted, updated, rejected
+
+
+def import_rows(resource, rows, batch_size=BATCH_SIZE, on_reject=None):
+    # import (line, row) pairs; on_reject(line, row, errors) is called for every
+    # rejected row. returns the counts of read, inserted, updated and rejected rows
+    model = RESOURCES[resource][0]
+    counts = {'read': 0, 'inserted': 0, 'updated': 0, 'rejected': 0}
+    form = new_form(resource)
+    batch = {}
+    raw = {}
+
+    def flush():
+        inserted, updated, rejected = load_batch(resource, list(batch.values()))
+        counts['inserted'] += inserted
+        counts['updated'] += updated
+        counts['rejected'] += len(rejected)
+        if on_reject:
+            for line, errors in rejected:
+                on_reject(line, raw[line], errors)
+        batch.clear()
+        raw.clear()
+
+    try:
+        for line, row in rows:
+            counts['read'] += 1
+            record, errors = validate(resource, row, form)
+            if errors:
+                counts['rejected'] += 1
+                if on_reject:
+                    on_reject(line, row, errors)
+                continue
+            # one upsert can't touch a row twice, so a later row with the same
+            # phone replaces the earlier one within a batch, as it would across batches
+            key = record['phone'] if record.get('phone') else ('line', line)
+            batch.pop(key, None)
+            batch[key] = (line, record)
+            if on_reject:
+                raw[line] = row
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        # the rows were written behind the session's back
+        cache.invalidate(model.__tablename__)
+    return counts
@@ -0,0 +1,219 @@
+import os
+import random
+import select
+import signal
+import socket
+import traceback
+
+from flask import current_app
+from sqlalchemy.dialects.postgresql import insert
+
+from models import Job, db
+
+#----------------------------------------------------------------------------#
+# Jobs
+#----------------------------------------------------------------------------#
+
+# Background jobs, kept in the job table so they need nothing but Postgres.
+# Views queue work that doesn't have to finish before the response:
+#
+#   @queue.task('refresh_counts')
+#   def refresh_counts(): ...
+#
+#   queue.enqueue('refresh_counts', run_at=show.start_time)
+#   db.session.commit()
+#
+# enqueue adds the job to the view's own transaction, so it is queued when
+# the write it follows commits and never exists for one that rolled back.
+# `flask fyyur worker` runs them: each worker claims the earliest due job with
+# FOR UPDATE SKIP LOCKED, so any number of workers share the queue without
+# taking the same job, and sleeps on LISTEN fyyur_jobs between jobs.
+#
+# A claimed job stays locked for JOB_TIMEOUT seconds; a worker that dies
+# mid-job leaves it to be claimed again after that, so tasks must be safe to
+# run twice. A task that raises, or whose worker dies, is retried (with
+# exponential backoff when it raised) until it has been tried
+# JOB_MAX_ATTEMPTS times, then marked failed (see `flask fyyur jobs`).
+
+CHANNEL = 'fyyur_jobs'
+
+# a job whose lock ran out on its last attempt took its worker down with it
+# (or outran JOB_TIMEOUT) every time; it fails rather than going round again.
+# locked_by is kept: a worker that was only slow can still finish it
+EXPIRE = db.text("""
+    UPDATE job SET status = 'failed',
+        last_error = 'worker ' || locked_by || ' stopped or timed out while running the job'
+    WHERE status = 'queued' AND run_at <= now() AND locked_by IS NOT NULL
+        AND attempts >= max_attempts
+    RETURNING id, task, attempts
+""")
+
+CLAIM = db.text("""
+    UPDATE job SET attempts = attempts + 1, locked_by = :worker,
+        run_at = now() + make_interval(secs => :timeout)
+    WHERE id = (
+        SELECT id FROM job
+        WHERE status = 'queued' AND run_at <= now() AND attempts < max_attempts
+        ORDER BY run_at, id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED)
+    RETURNING id, task, args, attempts, max_attempts
+""")
+
+# the worker checks locked_by so it never touches a job that timed out and
+# was claimed again. one that EXPIRE failed while it ran is still its own
+DONE = db.text('DELETE FROM job WHERE id = :id AND locked_by = :worker RETURNING status')
+
+RETRY = db.text("""
+    UPDATE job SET locked_by = NULL, last_error = :error,
+        status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+        run_at = now() + make_interval(secs => :delay)
+    WHERE id = :id AND locked_by = :worker
+""")
+
+
+def retry_delay(attempts, base, cap):
+    # seconds before the next try: doubling each time, with jitter so jobs
+    # that failed together don't all come back together
+    delay = min(cap, base * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class JobQueue:
+    def __init__(self):
+        self.tasks = {}
+        self.stopping = False
+
+    def init_app(self, app):
+        app.extensions['jobs'] = self
+
+    def task(self, name):
+        # registers fn to run jobs queued as name; its arguments come from the
+        # job's args, so they have to be JSON
+        def decorator(fn):
+            self.tasks[name] = fn
+            return fn
+        return decorator
+
+    #  Queueing
+    #  ----------------------------------------------------------------
+
+    def enqueue(self, task, args=None, run_at=None, key=None, session=None):
+        # queue task(**args) in session's transaction (db.session by default),
+        # to run from run_at on, or as soon as possible. does nothing if a job
+        # with the same key is already queued or running
+        if task not in self.tasks:
+            raise ValueError(f'Unknown task: {task}')
+        values = {
+            'task': task,
+            'args': args or {},
+            'key': key,
+            'max_attempts': current_app.config['JOB_MAX_ATTEMPTS'],
+        }
+        if run_at is not None:
+            values['run_at'] = run_at
+        statement = insert(Job).values(**values).on_conflict_do_nothing(
+            index_elements=['key'], index_where=Job.status == 'queued')
+        (session or db.session).execute(statement)
+
+    #  Running
+    #  ----------------------------------------------------------------
+
+    def run_one(self, worker):
+        # claim and run the earliest due job; False when none is due
+        config = current_app.config
+        for job in db.session.execute(EXPIRE):
+            current_app.logger.error('job %s (%s) failed after %s attempts: its worker stopped or timed out',
+                job.id, job.task, job.attempts)
+        job = db.session.execute(CLAIM, {'worker': worker, 'timeout': config['JOB_TIMEOUT']}).first()
+        db.session.commit()
+        if job is None:
+            return False
+
+        try:
+            if job.task not in self.tasks:
+                raise LookupError(f'Unknown task: {job.task}')
+            self.tasks[job.task](**job.args)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            error = traceback.format_exc()
+            delay = retry_delay(job.attempts, config['JOB_BACKOFF'], config['JOB_BACKOFF_MAX'])
+            retried = db.session.execute(RETRY, {'id': job.id, 'worker': worker, 'error': error, 'delay': delay})
+            db.session.commit()
+            if not retried.rowcount:
+                current_app.logger.warning('job %s (%s) failed after its lock ran out and another worker '
+                    'claimed it:\n%s', job.id, job.task, error)
+            elif job.attempts >= job.max_attempts:
+                current_app.logger.error('job %s (%s) failed after %s attempts:\n%s',
+                    job.id, job.task, job.attempts, error)
+            else:
+                current_app.logger.warning('job %s (%s) failed, retrying in %.0fs:\n%s',
+                    job.id, job.task, delay, error)
+        else:
+            status = db.session.execute(DONE, {'id': job.id, 'worker': worker}).scalar()
+            db.session.commit()
+            if status is None:
+                # it ran past JOB_TIMEOUT and another worker claimed it, which
+                # runs it again
+                current_app.logger.warning('job %s (%s) done after its lock ran out and another worker '
+                    'claimed it', job.id, job.task)
+            elif status == 'failed':
+                current_app.logger.warning('job %s (%s) done after it was marked failed for running past '
+                    'JOB_TIMEOUT', job.id, job.task)
+            else:
+                current_app.logger.info('job %s (%s) done', job.id, job.task)
+        return True
+
+    def work(self, burst=False):
+        # run jobs until SIGTERM or SIGINT, finishing the current one first;
+        # with burst, only until no job is due. returns how many were run
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        poll_interval = current_app.config['JOB_POLL_INTERVAL']
+        self.stopping = False
+
+        def stop(signum, frame):
+            self.stopping = True
+
+        handlers = {signum: signal.signal(signum, stop) for signum in (signal.SIGTERM, signal.SIGINT)}
+        # signals also write to this pipe, which ends the wait below at once
+        # (select itself is restarted after the handler runs)
+        wakeup, wakeup_write = os.pipe()
+        os.set_blocking(wakeup_write, False)
+        wakeup_fd = signal.set_wakeup_fd(wakeup_write)
+        # a connection of its own, out of the pool, that only listens. behind
+        # PgBouncer in transaction mode LISTEN does nothing and the worker
+        # falls back to checking every JOB_POLL_INTERVAL seconds
+        listener = db.engine.raw_connection()
+        listener.detach()
+        connection = listener.dbapi_connection
+        connection.autocommit = True
+        connection.cursor().execute(f'LISTEN {CHANNEL}')
+
+        done = 0
+        try:
+            while not self.stopping:
+                if self.run_one(worker):
+                    done += 1
+                    continue
+                db.session.remove()
+                if burst:
+                    break
+                # nothing due: sleep until a job is queued, or long enough to
+                # pick up delayed jobs and retries
+                ready, _, _ = select.select([connection, wakeup], [], [], poll_interval)
+                if connection in ready:
+                    connection.poll()
+                    connection.notifies.clear()
+        finally:
+            listener.close()
+            db.session.remove()
+            signal.set_wakeup_fd(wakeup_fd)
+            os.close(wakeup)
+            os.close(wakeup_write)
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        return done
+
+
+queue = JobQueue()
@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, \
+    Histogram, generate_latest, multiprocess
+from sqlalchemy import event
+
+from cache import cache
+
+#----------------------------------------------------------------------------#
+# Metrics
+#----------------------------------------------------------------------------#
+
+# Prometheus metrics, served at /metrics: request counts and latency histograms
+# per route (labelled by endpoint, e.g. venues.show_venue), SQL statements per
+# request, views that raised, connection pool gauges and page cache lookups.
+#
+# Under gunicorn every worker has its own copy of these, so they are kept in
+# files under PROMETHEUS_MULTIPROC_DIR and /metrics adds up all workers' files.
+# gunicorn.conf.py sets that up; the variable has to be in the environment
+# before prometheus_client is first imported. Without it, /metrics reports the
+# process serving the scrape, which is right for a single process.
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+REQUESTS = Counter('fyyur_http_requests_total',
+    'Requests answered, by route and status.', ('method', 'endpoint', 'status'))
+LATENCY = Histogram('fyyur_http_request_duration_seconds',
+    'Time from the start of a request until its response was ready, by route.',
+    ('method', 'endpoint'), buckets=LATENCY_BUCKETS)
+EXCEPTIONS = Counter('fyyur_http_request_exceptions_total',
+    'Requests whose view raised, by route and exception.', ('endpoint', 'exception'))
+QUERIES = Histogram('fyyur_db_queries_per_request',
+    'SQL statements run per request, by route.', ('endpoint',), buckets=QUERY_BUCKETS)
+# livesum: summed over the workers that are still running
+POOL_SIZE = Gauge('fyyur_db_pool_size',
+    'Connections each pool keeps open, summed over workers.', multiprocess_mode='livesum')
+POOL_CHECKED_OUT = Gauge('fyyur_db_pool_checked_out',
+    'Connections in use.', multiprocess_mode='livesum')
+POOL_OVERFLOW = Gauge('fyyur_db_pool_overflow',
+    'Connections open beyond the pool size.', multiprocess_mode='livesum')
+CACHE_LOOKUPS = Counter('fyyur_cache_lookups_total',
+    'Page and fragment cache lookups, by result.', ('result',))
+
+
+def endpoint():
+    # unmatched urls share one label, so scanners can't add a series per url
+    return request.endpoint or 'unmatched'
+
+
+def metrics_view():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+class Metrics:
+    def __init__(self):
+        self.instrumented = set()
+
+    def init_app(self, app, engine):
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+        app.add_url_rule('/metrics', 'metrics', metrics_view)
+        if id(engine) not in self.instrumented:
+            self.instrumented.add(id(engine))
+            self.instrument(engine)
+        if self.cache_lookup not in cache.listeners:
+            cache.listeners.append(self.cache_lookup)
+        app.extensions['metrics'] = self
+
+    def instrument(self, engine):
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if has_request_context() and 'metrics_queries' in g:
+                g.metrics_queries += 1
+
+        pool = engine.pool
+        if not hasattr(pool, 'size'):
+            # NullPool (PgBouncer mode) opens a connection per checkout
+            return
+        size = pool.size()
+        POOL_SIZE.inc(size)
+        lock = threading.Lock()
+        opened = [0]
+
+        def count_open(change):
+            with lock:
+                opened[0] += change
+                POOL_OVERFLOW.set(max(0, opened[0] - size))
+
+        @event.listens_for(pool, 'connect')
+        def on_connect(dbapi_connection, connection_record):
+            count_open(1)
+
+        @event.listens_for(pool, 'close')
+        def on_close(dbapi_connection, connection_record):
+            count_open(-1)
+
+        # a detached connection is no longer the pool's
+        @event.listens_for(pool, 'detach')
+        def on_detach(dbapi_connection, connection_record):
+            count_open(-1)
+
+        @event.listens_for(pool, 'checkout')
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            POOL_CHECKED_OUT.inc()
+
+        @event.listens_for(pool, 'checkin')
+        def on_checkin(dbapi_connection, connection_record):
+            POOL_CHECKED_OUT.dec()
+
+    def cache_lookup(self, hit):
+        CACHE_LOOKUPS.labels('hit' if hit else 'miss').inc()
+
+    #  Per request
+    #  ----------------------------------------------------------------
+
+    def before_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_queries = 0
+
+    def after_request(self, response):
+        if 'metrics_start' in g:
+            LATENCY.labels(request.method, endpoint()).observe(time.perf_counter() - g.metrics_start)
+            REQUESTS.labels(request.method, endpoint(), response.status_code).inc()
+            QUERIES.labels(endpoint()).observe(g.metrics_queries)
+        return response
+
+    def teardown_request(self, error):
+        if error is not None:
+            EXCEPTIONS.labels(endpoint(), type(error).__name__).inc()
+
+
+metrics = Metrics()
@@ -0,0 +1,30 @@
+""" Added trigram indexes on artist.name and venue.name
+    for case-insensitive partial name search
+
+Revision ID: 4f1c2a7d9b3e
+Revises: 9389b4062121
+Create Date: 2026-10-18 09:12:40.512873
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f1c2a7d9b3e'
+down_revision = '9389b4062121'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_artist_name_trgm', 'artist', ['name'], unique=False,
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_venue_name_trgm', 'venue', ['name'], unique=False,
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_venue_name_trgm', table_name='venue')
+    op.drop_index('ix_artist_name_trgm', table_name='artist')
@@ -0,0 +1,30 @@
+""" Added updated_at to artist, venue and show
+    for conditional GET (ETag / Last-Modified)
+
+Revision ID: 8a4d1f6c3e52
+Revises: 5c0e9b2f7d18
+Create Date: 2026-10-18 13:41:26.118904
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4d1f6c3e52'
+down_revision = '5c0e9b2f7d18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('artist', 'venue', 'show'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+            server_default=sa.text("timezone('utc', now())")))
+        op.create_index(op.f(f'ix_{table}_updated_at'), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in ('show', 'venue', 'artist'):
+        op.drop_index(op.f(f'ix_{table}_updated_at'), table_name=table)
+        op.drop_column(table, 'updated_at')
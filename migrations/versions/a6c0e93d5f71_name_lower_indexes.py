@@ -0,0 +1,27 @@
+""" Added lower(name) text_pattern_ops indexes on artist and venue,
+    for name prefix lookups
+
+Revision ID: a6c0e93d5f71
+Revises: d93f1a6b2e58
+Create Date: 2026-10-19 12:40:09.117348
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c0e93d5f71'
+down_revision = 'd93f1a6b2e58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('artist', 'venue'):
+        op.create_index(f'ix_{table}_name_lower', table, [sa.text('lower(name) text_pattern_ops')], unique=False)
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_index(f'ix_{table}_name_lower', table_name=table)
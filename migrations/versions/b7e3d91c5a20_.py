@@ -0,0 +1,56 @@
+""" Added a search_vector tsvector column to artist and venue,
+    kept up to date by a trigger, with a GIN index for ranked search
+
+Revision ID: b7e3d91c5a20
+Revises: 4f1c2a7d9b3e
+Create Date: 2026-10-18 10:03:17.208441
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e3d91c5a20'
+down_revision = '4f1c2a7d9b3e'
+branch_labels = None
+depends_on = None
+
+# name weighs most, then genres, then city/state
+SEARCH_VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION {table}_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.genres, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.city, '') || ' ' || coalesce(NEW.state, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+SEARCH_VECTOR_TRIGGER = """
+CREATE TRIGGER {table}_search_vector_trigger
+BEFORE INSERT OR UPDATE OF name, genres, city, state ON {table}
+FOR EACH ROW EXECUTE FUNCTION {table}_search_vector_update()
+"""
+
+
+def upgrade():
+    for table in ('artist', 'venue'):
+        op.add_column(table, sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        op.execute(SEARCH_VECTOR_FUNCTION.format(table=table))
+        op.execute(SEARCH_VECTOR_TRIGGER.format(table=table))
+        # fire the trigger once for the existing rows
+        op.execute(f'UPDATE {table} SET name = name')
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], unique=False,
+            postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('venue', 'artist'):
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        op.execute(f'DROP TRIGGER {table}_search_vector_trigger ON {table}')
+        op.execute(f'DROP FUNCTION {table}_search_vector_update()')
+        op.drop_column(table, 'search_vector')
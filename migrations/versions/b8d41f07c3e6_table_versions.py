@@ -0,0 +1,56 @@
+""" Added table_version, a version per table bumped by statement
+    triggers on artist, venue and show
+
+Revision ID: b8d41f07c3e6
+Revises: f3a9c6e1d247
+Create Date: 2026-10-19 10:04:17.552310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d41f07c3e6'
+down_revision = 'f3a9c6e1d247'
+branch_labels = None
+depends_on = None
+
+TABLES = ('artist', 'venue', 'show')
+
+# once per statement, however many rows it wrote. the row lock orders
+# concurrent writers, so changed_at (taken after it) only moves forward
+BUMP_FUNCTION = """
+CREATE OR REPLACE FUNCTION table_version_bump() RETURNS trigger AS $$
+BEGIN
+    UPDATE table_version
+    SET version = version + 1, changed_at = timezone('utc', clock_timestamp())
+    WHERE table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    op.create_table('table_version',
+        sa.Column('table_name', sa.String(length=63), nullable=False),
+        sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+        sa.Column('changed_at', sa.DateTime(), server_default=sa.text("timezone('utc', now())"), nullable=False),
+        sa.PrimaryKeyConstraint('table_name')
+    )
+    for table in TABLES:
+        op.execute(f"INSERT INTO table_version (table_name, changed_at) "
+            f"SELECT '{table}', coalesce(max(updated_at), timezone('utc', now())) FROM {table}")
+
+    op.execute(BUMP_FUNCTION)
+    for table in TABLES:
+        op.execute(f'CREATE TRIGGER {table}_version_trigger AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE '
+            f'ON {table} FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump()')
+
+
+def downgrade():
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER {table}_version_trigger ON {table}')
+    op.execute('DROP FUNCTION table_version_bump()')
+    op.drop_table('table_version')
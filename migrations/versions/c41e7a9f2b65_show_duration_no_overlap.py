@@ -0,0 +1,51 @@
+""" Added duration and end_time to show, and exclusion constraints
+    against overlapping shows at a venue or by an artist
+
+Revision ID: c41e7a9f2b65
+Revises: 8a4d1f6c3e52
+Create Date: 2026-10-18 15:12:40.503127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e7a9f2b65'
+down_revision = '8a4d1f6c3e52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # btree_gist lets the integer venue_id/artist_id share a GiST index with the time range
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    # existing shows get the same two hours the form defaults to
+    op.add_column('show', sa.Column('duration', sa.Integer(), nullable=False, server_default='120'))
+    op.add_column('show', sa.Column('end_time', sa.DateTime(),
+        sa.Computed("start_time + duration * interval '1 minute'", persisted=True)))
+    op.create_check_constraint('ck_show_duration_positive', 'show', 'duration > 0')
+
+    connection = op.get_bind()
+    for column in ('venue_id', 'artist_id'):
+        overlaps = connection.execute(sa.text(f"""
+            SELECT a.id, b.id FROM show a JOIN show b
+              ON a.{column} = b.{column} AND a.id < b.id
+             AND tsrange(a.start_time, a.end_time) && tsrange(b.start_time, b.end_time)
+            LIMIT 10
+        """)).fetchall()
+        if overlaps:
+            pairs = ', '.join(f'{a}/{b}' for a, b in overlaps)
+            raise RuntimeError(f'Shows overlapping on {column} must be moved or removed first: {pairs}')
+
+        op.execute(f'ALTER TABLE show ADD CONSTRAINT show_{column}_no_overlap '
+            f'EXCLUDE USING gist ({column} WITH =, tsrange(start_time, end_time) WITH &&) '
+            'WHERE (start_time IS NOT NULL)')
+
+
+def downgrade():
+    op.drop_constraint('show_artist_id_no_overlap', 'show')
+    op.drop_constraint('show_venue_id_no_overlap', 'show')
+    op.drop_constraint('ck_show_duration_positive', 'show')
+    op.drop_column('show', 'end_time')
+    op.drop_column('show', 'duration')
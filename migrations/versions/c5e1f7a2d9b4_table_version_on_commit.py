@@ -0,0 +1,106 @@
+""" Bump table_version as transactions commit instead of on every
+    write, so concurrent writers to a table don't wait on its row
+
+Revision ID: c5e1f7a2d9b4
+Revises: a6c0e93d5f71
+Create Date: 2026-10-19 14:02:31.446018
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e1f7a2d9b4'
+down_revision = 'a6c0e93d5f71'
+branch_labels = None
+depends_on = None
+
+TABLES = ('artist', 'venue', 'show')
+
+# the statement triggers only note, once per transaction and table, that the
+# transaction wrote to it. the row they insert fires a deferred trigger as the
+# transaction commits, which bumps every table the transaction wrote to at
+# once. the version rows are locked from then until the commit is done, not
+# from the first write, and in name order, so two commits never wait on each
+# other crosswise. fyyur.touched_<table> is reset after a bump, so writes
+# made after constraints were set IMMEDIATE are counted again
+TOUCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION table_version_touch() RETURNS trigger AS $$
+BEGIN
+    IF current_setting('fyyur.touched_' || TG_TABLE_NAME, true) IS DISTINCT FROM 'on' THEN
+        PERFORM set_config('fyyur.touched_' || TG_TABLE_NAME, 'on', true);
+        INSERT INTO table_version_pending (table_name) VALUES (TG_TABLE_NAME);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+COMMIT_FUNCTION = """
+CREATE OR REPLACE FUNCTION table_version_commit() RETURNS trigger AS $$
+DECLARE
+    tables text[];
+    touched text;
+BEGIN
+    WITH done AS (
+        DELETE FROM table_version_pending WHERE txid = txid_current() RETURNING table_name)
+    SELECT array_agg(DISTINCT table_name ORDER BY table_name) INTO tables FROM done;
+    -- the other rows this transaction inserted fire this too, and find none left
+    IF tables IS NULL THEN
+        RETURN NULL;
+    END IF;
+    PERFORM 1 FROM table_version WHERE table_name = ANY(tables) ORDER BY table_name FOR UPDATE;
+    UPDATE table_version
+    SET version = version + 1, changed_at = timezone('utc', clock_timestamp())
+    WHERE table_name = ANY(tables);
+    FOREACH touched IN ARRAY tables LOOP
+        PERFORM set_config('fyyur.touched_' || touched, '', true);
+    END LOOP;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+# as it was in b8d41f07c3e6
+BUMP_FUNCTION = """
+CREATE OR REPLACE FUNCTION table_version_bump() RETURNS trigger AS $$
+BEGIN
+    UPDATE table_version
+    SET version = version + 1, changed_at = timezone('utc', clock_timestamp())
+    WHERE table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    # rows only live as long as the transaction that wrote them, so the table
+    # needn't survive a crash
+    op.create_table('table_version_pending',
+        sa.Column('txid', sa.BigInteger(), server_default=sa.text('txid_current()'), nullable=False),
+        sa.Column('table_name', sa.String(length=63), nullable=False),
+        prefixes=['UNLOGGED']
+    )
+    op.execute(TOUCH_FUNCTION)
+    op.execute(COMMIT_FUNCTION)
+    op.execute('CREATE CONSTRAINT TRIGGER table_version_pending_commit AFTER INSERT ON table_version_pending '
+        'DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION table_version_commit()')
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER {table}_version_trigger ON {table}')
+        op.execute(f'CREATE TRIGGER {table}_version_trigger AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE '
+            f'ON {table} FOR EACH STATEMENT EXECUTE FUNCTION table_version_touch()')
+    op.execute('DROP FUNCTION table_version_bump()')
+
+
+def downgrade():
+    op.execute(BUMP_FUNCTION)
+    for table in TABLES:
+        op.execute(f'DROP TRIGGER {table}_version_trigger ON {table}')
+        op.execute(f'CREATE TRIGGER {table}_version_trigger AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE '
+            f'ON {table} FOR EACH STATEMENT EXECUTE FUNCTION table_version_bump()')
+    op.execute('DROP TRIGGER table_version_pending_commit ON table_version_pending')
+    op.execute('DROP FUNCTION table_version_commit()')
+    op.execute('DROP FUNCTION table_version_touch()')
+    op.drop_table('table_version_pending')
@@ -0,0 +1,71 @@
+""" Changed artist.genres and venue.genres from strings to arrays
+    with GIN indexes, converting the existing rows
+
+Revision ID: d2a8f6e41c97
+Revises: b7e3d91c5a20
+Create Date: 2026-10-18 11:27:52.640119
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a8f6e41c97'
+down_revision = 'b7e3d91c5a20'
+branch_labels = None
+depends_on = None
+
+# rows written from the forms hold a stringified list ('{Jazz,"Rock n Roll"}'),
+# anything else is treated as a comma separated list ('Jazz, Rock n Roll')
+TO_ARRAY = """
+CASE
+    WHEN left(genres, 1) = '{' THEN genres::varchar[]
+    ELSE regexp_split_to_array(trim(genres), '\\s*,\\s*')
+END
+"""
+
+SEARCH_VECTOR_FUNCTION = """
+CREATE OR REPLACE FUNCTION {table}_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce({genres}, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.city, '') || ' ' || coalesce(NEW.state, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+SEARCH_VECTOR_TRIGGER = """
+CREATE TRIGGER {table}_search_vector_trigger
+BEFORE INSERT OR UPDATE OF name, genres, city, state ON {table}
+FOR EACH ROW EXECUTE FUNCTION {table}_search_vector_update()
+"""
+
+
+def upgrade():
+    for table in ('artist', 'venue'):
+        # the search trigger names the column, so it has to go while the type changes
+        op.execute(f'DROP TRIGGER {table}_search_vector_trigger ON {table}')
+        op.alter_column(table, 'genres',
+            existing_type=sa.String(length=120),
+            type_=postgresql.ARRAY(sa.String(length=120)),
+            postgresql_using=TO_ARRAY)
+        op.execute(SEARCH_VECTOR_FUNCTION.format(table=table, genres="array_to_string(NEW.genres, ' ')"))
+        op.execute(SEARCH_VECTOR_TRIGGER.format(table=table))
+        op.create_index(f'ix_{table}_genres', table, ['genres'], unique=False,
+            postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('venue', 'artist'):
+        op.drop_index(f'ix_{table}_genres', table_name=table)
+        op.execute(f'DROP TRIGGER {table}_search_vector_trigger ON {table}')
+        op.alter_column(table, 'genres',
+            existing_type=postgresql.ARRAY(sa.String(length=120)),
+            type_=sa.String(length=120),
+            postgresql_using="array_to_string(genres, ',')")
+        op.execute(SEARCH_VECTOR_FUNCTION.format(table=table, genres='NEW.genres'))
+        op.execute(SEARCH_VECTOR_TRIGGER.format(table=table))
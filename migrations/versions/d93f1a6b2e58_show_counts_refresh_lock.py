@@ -0,0 +1,71 @@
+""" Lock the venue and artist rows in show_counts_refresh before
+    counting, so concurrent recounts of one venue or artist can't
+    overwrite each other with a stale count
+
+Revision ID: d93f1a6b2e58
+Revises: b8d41f07c3e6
+Create Date: 2026-10-19 11:26:53.904127
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd93f1a6b2e58'
+down_revision = 'b8d41f07c3e6'
+branch_labels = None
+depends_on = None
+
+# two transactions adding shows for one venue each counted from their own
+# snapshot, and the later upsert wrote its count over the other's. taking the
+# rows' locks first makes the second wait for the first to commit, and its
+# count runs with a new snapshot that includes the first one's show. rows are
+# locked in id order so two recounts never wait on each other. row locks, not
+# advisory ones, as refresh-counts --all recounts every row in one call.
+# FOR NO KEY UPDATE doesn't conflict with the FOR KEY SHARE locks that
+# inserting a show takes on its venue and artist
+LOCKS = """
+    PERFORM 1 FROM venue WHERE id = ANY(venue_ids) ORDER BY id FOR NO KEY UPDATE;
+    PERFORM 1 FROM artist WHERE id = ANY(artist_ids) ORDER BY id FOR NO KEY UPDATE;
+"""
+
+REFRESH_FUNCTION = """
+CREATE OR REPLACE FUNCTION show_counts_refresh(venue_ids integer[], artist_ids integer[]) RETURNS void AS $$
+BEGIN
+{locks}
+    INSERT INTO venue_show_counts (venue_id, upcoming_shows_count, past_shows_count, next_show_at)
+    SELECT venue.id,
+           count(show.id) FILTER (WHERE show.start_time > now()),
+           count(show.id) FILTER (WHERE show.start_time <= now()),
+           min(show.start_time) FILTER (WHERE show.start_time > now())
+    FROM venue LEFT JOIN show ON show.venue_id = venue.id
+    WHERE venue.id = ANY(venue_ids)
+    GROUP BY venue.id
+    ON CONFLICT (venue_id) DO UPDATE SET
+        upcoming_shows_count = EXCLUDED.upcoming_shows_count,
+        past_shows_count = EXCLUDED.past_shows_count,
+        next_show_at = EXCLUDED.next_show_at;
+
+    INSERT INTO artist_show_counts (artist_id, upcoming_shows_count, past_shows_count, next_show_at)
+    SELECT artist.id,
+           count(show.id) FILTER (WHERE show.start_time > now()),
+           count(show.id) FILTER (WHERE show.start_time <= now()),
+           min(show.start_time) FILTER (WHERE show.start_time > now())
+    FROM artist LEFT JOIN show ON show.artist_id = artist.id
+    WHERE artist.id = ANY(artist_ids)
+    GROUP BY artist.id
+    ON CONFLICT (artist_id) DO UPDATE SET
+        upcoming_shows_count = EXCLUDED.upcoming_shows_count,
+        past_shows_count = EXCLUDED.past_shows_count,
+        next_show_at = EXCLUDED.next_show_at;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    op.execute(REFRESH_FUNCTION.format(locks=LOCKS))
+
+
+def downgrade():
+    op.execute(REFRESH_FUNCTION.format(locks=''))
@@ -0,0 +1,39 @@
+""" Replaced the lower(name) indexes on artist and venue with
+    name_fold(name) ones, folding whitespace as the typeahead does
+
+Revision ID: e2b7d4c8f619
+Revises: c5e1f7a2d9b4
+Create Date: 2026-10-19 15:21:44.870213
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b7d4c8f619'
+down_revision = 'c5e1f7a2d9b4'
+branch_labels = None
+depends_on = None
+
+# the SQL twin of queries.fold: lower case, runs of whitespace made one space,
+# none at either end
+FOLD_FUNCTION = r"""
+CREATE OR REPLACE FUNCTION name_fold(name text) RETURNS text AS $$
+    SELECT btrim(regexp_replace(lower(name), '[ \t\n\r\f\v]+', ' ', 'g'), ' ')
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE
+"""
+
+
+def upgrade():
+    op.execute(FOLD_FUNCTION)
+    for table in ('artist', 'venue'):
+        op.drop_index(f'ix_{table}_name_lower', table_name=table)
+        op.create_index(f'ix_{table}_name_fold', table, [sa.text('name_fold(name) text_pattern_ops')], unique=False)
+
+
+def downgrade():
+    for table in ('artist', 'venue'):
+        op.drop_index(f'ix_{table}_name_fold', table_name=table)
+        op.create_index(f'ix_{table}_name_lower', table, [sa.text('lower(name) text_pattern_ops')], unique=False)
+    op.execute('DROP FUNCTION name_fold(text)')
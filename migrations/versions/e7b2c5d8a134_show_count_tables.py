@@ -0,0 +1,112 @@
+""" Added venue_show_counts and artist_show_counts, upcoming/past show
+    counters kept up to date by statement triggers on show
+
+Revision ID: e7b2c5d8a134
+Revises: c41e7a9f2b65
+Create Date: 2026-10-18 16:48:02.771940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b2c5d8a134'
+down_revision = 'c41e7a9f2b65'
+branch_labels = None
+depends_on = None
+
+# recounts the shows of the given venues and artists from the show indexes.
+# next_show_at is when the counts go stale next: the refresh-counts job
+# recounts every row whose next show has started
+REFRESH_FUNCTION = """
+CREATE OR REPLACE FUNCTION show_counts_refresh(venue_ids integer[], artist_ids integer[]) RETURNS void AS $$
+BEGIN
+    INSERT INTO venue_show_counts (venue_id, upcoming_shows_count, past_shows_count, next_show_at)
+    SELECT venue.id,
+           count(show.id) FILTER (WHERE show.start_time > now()),
+           count(show.id) FILTER (WHERE show.start_time <= now()),
+           min(show.start_time) FILTER (WHERE show.start_time > now())
+    FROM venue LEFT JOIN show ON show.venue_id = venue.id
+    WHERE venue.id = ANY(venue_ids)
+    GROUP BY venue.id
+    ON CONFLICT (venue_id) DO UPDATE SET
+        upcoming_shows_count = EXCLUDED.upcoming_shows_count,
+        past_shows_count = EXCLUDED.past_shows_count,
+        next_show_at = EXCLUDED.next_show_at;
+
+    INSERT INTO artist_show_counts (artist_id, upcoming_shows_count, past_shows_count, next_show_at)
+    SELECT artist.id,
+           count(show.id) FILTER (WHERE show.start_time > now()),
+           count(show.id) FILTER (WHERE show.start_time <= now()),
+           min(show.start_time) FILTER (WHERE show.start_time > now())
+    FROM artist LEFT JOIN show ON show.artist_id = artist.id
+    WHERE artist.id = ANY(artist_ids)
+    GROUP BY artist.id
+    ON CONFLICT (artist_id) DO UPDATE SET
+        upcoming_shows_count = EXCLUDED.upcoming_shows_count,
+        past_shows_count = EXCLUDED.past_shows_count,
+        next_show_at = EXCLUDED.next_show_at;
+END
+$$ LANGUAGE plpgsql
+"""
+
+# once per statement, so a bulk insert recounts each venue and artist it touched once
+TRIGGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION show_counts_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM show_counts_refresh(
+            ARRAY(SELECT DISTINCT venue_id FROM new_rows),
+            ARRAY(SELECT DISTINCT artist_id FROM new_rows));
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM show_counts_refresh(
+            ARRAY(SELECT DISTINCT venue_id FROM old_rows),
+            ARRAY(SELECT DISTINCT artist_id FROM old_rows));
+    ELSE
+        PERFORM show_counts_refresh(
+            ARRAY(SELECT venue_id FROM old_rows UNION SELECT venue_id FROM new_rows),
+            ARRAY(SELECT artist_id FROM old_rows UNION SELECT artist_id FROM new_rows));
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+# transition tables need one trigger per event
+TRIGGERS = {
+    'insert': 'AFTER INSERT ON show REFERENCING NEW TABLE AS new_rows',
+    'update': 'AFTER UPDATE ON show REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows',
+    'delete': 'AFTER DELETE ON show REFERENCING OLD TABLE AS old_rows',
+}
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.create_table(f'{table}_show_counts',
+            sa.Column(f'{table}_id', sa.Integer(), nullable=False),
+            sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False),
+            sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False),
+            sa.Column('next_show_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint([f'{table}_id'], [f'{table}.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint(f'{table}_id')
+        )
+        op.create_index(op.f(f'ix_{table}_show_counts_next_show_at'), f'{table}_show_counts',
+            ['next_show_at'], unique=False)
+
+    op.execute(REFRESH_FUNCTION)
+    op.execute(TRIGGER_FUNCTION)
+    for event, clause in TRIGGERS.items():
+        op.execute(f'CREATE TRIGGER show_counts_{event}_trigger {clause} '
+            'FOR EACH STATEMENT EXECUTE FUNCTION show_counts_update()')
+    op.execute('SELECT show_counts_refresh(ARRAY(SELECT id FROM venue), ARRAY(SELECT id FROM artist))')
+
+
+def downgrade():
+    for event in TRIGGERS:
+        op.execute(f'DROP TRIGGER show_counts_{event}_trigger ON show')
+    op.execute('DROP FUNCTION show_counts_update()')
+    op.execute('DROP FUNCTION show_counts_refresh(integer[], integer[])')
+    for table in ('artist', 'venue'):
+        op.drop_index(op.f(f'ix_{table}_show_counts_next_show_at'), table_name=f'{table}_show_counts')
+        op.drop_table(f'{table}_show_counts')
@@ -0,0 +1,62 @@
+""" Added job, the background job queue, with a trigger that wakes
+    listening workers when jobs are queued
+
+Revision ID: f3a9c6e1d247
+Revises: e7b2c5d8a134
+Create Date: 2026-10-18 19:12:40.318562
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9c6e1d247'
+down_revision = 'e7b2c5d8a134'
+branch_labels = None
+depends_on = None
+
+# notifications are delivered when the inserting transaction commits, so a
+# worker never wakes for a job it can't see yet
+NOTIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION job_notify() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('fyyur_jobs', '');
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    op.create_table('job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('task', sa.String(length=120), nullable=False),
+        sa.Column('args', postgresql.JSONB(astext_type=sa.Text()), server_default='{}', nullable=False),
+        sa.Column('key', sa.String(length=200), nullable=True),
+        sa.Column('status', sa.String(length=20), server_default='queued', nullable=False),
+        sa.Column('run_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('max_attempts', sa.Integer(), server_default='5', nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('locked_by', sa.String(length=200), nullable=True),
+        sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_job_run_at_queued', 'job', ['run_at'], unique=False,
+        postgresql_where=sa.text("status = 'queued'"))
+    op.create_index('ix_job_key_queued', 'job', ['key'], unique=True,
+        postgresql_where=sa.text("status = 'queued'"))
+
+    op.execute(NOTIFY_FUNCTION)
+    op.execute('CREATE TRIGGER job_notify_trigger AFTER INSERT ON job '
+        'FOR EACH STATEMENT EXECUTE FUNCTION job_notify()')
+
+
+def downgrade():
+    op.execute('DROP TRIGGER job_notify_trigger ON job')
+    op.execute('DROP FUNCTION job_notify()')
+    op.drop_index('ix_job_key_queued', table_name='job')
+    op.drop_index('ix_job_run_at_queued', table_name='job')
+    op.drop_table('job')
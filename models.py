@@ -1,4 +1,7 @@
+from datetime import datetime
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR, ExcludeConstraint
 
 db=SQLAlchemy()
 #----------------------------------------------------------------------------#
@@ -11,19 +14,36 @@ db=SQLAlchemy()
 
 class Artist(db.Model):
     __tablename__ = 'artist'
+    __table_args__ = (
+        # trigram index for case-insensitive partial name search (needs the pg_trgm extension)
+        db.Index('ix_artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_artist_search_vector', 'search_vector', postgresql_using='gin'),
+        # folded name (see queries.fold) in byte order: a name prefix is a range
+        # of it (the typeahead's fallback)
+        db.Index('ix_artist_name_fold', db.text('name_fold(name) text_pattern_ops')),
+        # genre containment (genres @> ARRAY['Jazz'])
+        db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(), nullable=False)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.Column(ARRAY(db.String(120)))
     phone = db.Column(db.String(120), unique=True)
     seeking_venue = db.Column(db.Boolean, default=False, nullable=False)
     seeking_description=db.Column(db.String(120))
-    show = db.relationship('Show', backref='artist', cascade="all, delete-orphan")
+    # shows are queried per page (see queries.py) rather than loaded as a whole collection;
+    # a show always pulls its artist and venue in with it.
+    show = db.relationship('Show', backref=db.backref('artist', lazy='joined'), cascade="all, delete-orphan", lazy='dynamic')
     website = db.Column(db.String(120))
     facebook_link = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
+    # weighted name/genres/city/state document, maintained by a database trigger
+    search_vector = db.deferred(db.Column(TSVECTOR))
+    # last change to the row, in UTC; keys the cached fragments showing it
+    updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.utcnow,
+        onupdate=datetime.utcnow, server_default=db.text("timezone('utc', now())"))
 
 
     def __repr__(self):
@@ -31,20 +51,35 @@ class Artist(db.Model):
 
 class Venue(db.Model):
     __tablename__ = 'venue'
+    __table_args__ = (
+        # trigram index for case-insensitive partial name search (needs the pg_trgm extension)
+        db.Index('ix_venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_venue_search_vector', 'search_vector', postgresql_using='gin'),
+        # folded name (see queries.fold) in byte order: a name prefix is a range
+        # of it (the typeahead's fallback)
+        db.Index('ix_venue_name_fold', db.text('name_fold(name) text_pattern_ops')),
+        # genre containment (genres @> ARRAY['Jazz'])
+        db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.Column(ARRAY(db.String(120)))
     phone = db.Column(db.String(120), unique=True)
     seeking_talent = db.Column(db.Boolean, default=False, nullable=False)
     seeking_description=db.Column(db.String(120))
-    show = db.relationship('Show', backref='venue', cascade="all, delete-orphan")
+    show = db.relationship('Show', backref=db.backref('venue', lazy='joined'), cascade="all, delete-orphan", lazy='dynamic')
     website = db.Column(db.String(120))
     facebook_link = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
+    # weighted name/genres/city/state document, maintained by a database trigger
+    search_vector = db.deferred(db.Column(TSVECTOR))
+    # last change to the row, in UTC; keys the cached fragments showing it
+    updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.utcnow,
+        onupdate=datetime.utcnow, server_default=db.text("timezone('utc', now())"))
 
 
     def __repr__(self):
@@ -53,13 +88,106 @@ class Venue(db.Model):
 
 class Show(db.Model):
     __tablename__= 'show'
+    __table_args__ = (
+        # every page filters shows by venue or artist plus start_time; the listing
+        # pages through all shows by (start_time, id)
+        db.Index('ix_show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_id_start_time', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time_id', 'start_time', 'id'),
+        # a venue, and an artist, can only be booked for one show at a time. the
+        # GiST indexes behind these also answer availability queries (queries.free_slots)
+        ExcludeConstraint(('venue_id', '='), (db.text('tsrange(start_time, end_time)'), '&&'),
+            name='show_venue_id_no_overlap', using='gist', where=db.text('start_time IS NOT NULL')),
+        ExcludeConstraint(('artist_id', '='), (db.text('tsrange(start_time, end_time)'), '&&'),
+            name='show_artist_id_no_overlap', using='gist', where=db.text('start_time IS NOT NULL')),
+        db.CheckConstraint('duration > 0', name='ck_show_duration_positive'),
+    )
 
     id = db.Column(db.Integer, primary_key = True)
     start_time = db.Column(db.DateTime)
+    # minutes; end_time is computed from it by the database
+    duration = db.Column(db.Integer, nullable=False, default=120, server_default='120')
+    end_time = db.Column(db.DateTime, db.Computed("start_time + duration * interval '1 minute'"))
     artist_id = db.Column(db.Integer, db.ForeignKey('artist.id'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('venue.id'), nullable=False)
+    # last change to the row, in UTC; keys the cached fragments showing it
+    updated_at = db.Column(db.DateTime, nullable=False, index=True, default=datetime.utcnow,
+        onupdate=datetime.utcnow, server_default=db.text("timezone('utc', now())"))
 
 
     def __repr__(self):
         return f'<Show: {self.artist_id}, {self.venue_id}, {self.start_time}>'
 
+
+
+class VenueShowCounts(db.Model):
+    # upcoming/past show counts per venue, so listing and search pages don't
+    # count shows. written only by the database: statement triggers on show
+    # recount the venues a write touched, and `flask fyyur refresh-counts`
+    # recounts those whose next show has started (next_show_at <= now())
+    __tablename__ = 'venue_show_counts'
+
+    venue_id = db.Column(db.Integer, db.ForeignKey('venue.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, server_default='0')
+    next_show_at = db.Column(db.DateTime, index=True)
+
+
+class ArtistShowCounts(db.Model):
+    # the same per artist
+    __tablename__ = 'artist_show_counts'
+
+    artist_id = db.Column(db.Integer, db.ForeignKey('artist.id', ondelete='CASCADE'), primary_key=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, server_default='0')
+    next_show_at = db.Column(db.DateTime, index=True)
+
+
+class TableVersion(db.Model):
+    # one row per table, bumped once by each transaction that inserts, updates,
+    # deletes or truncates in it, as the transaction commits. pages build their
+    # validators from these instead of counting rows
+    __tablename__ = 'table_version'
+
+    table_name = db.Column(db.String(63), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, server_default='0')
+    # UTC, when the last write to the table was committed
+    changed_at = db.Column(db.DateTime, nullable=False, server_default=db.text("timezone('utc', now())"))
+
+
+# the tables each open transaction has written to, inserted by statement
+# triggers and removed as the transaction commits and bumps their versions (see
+# the c5e1f7a2d9b4 migration). unlogged and without a key, so not a model
+table_version_pending = db.Table('table_version_pending',
+    db.Column('txid', db.BigInteger, nullable=False, server_default=db.text('txid_current()')),
+    db.Column('table_name', db.String(63), nullable=False),
+    prefixes=['UNLOGGED'],
+)
+
+
+class Job(db.Model):
+    # background work queued by the app and run by `flask fyyur worker`, see
+    # jobs.py. a queued job with locked_by set is running, and run_at is when
+    # its lock runs out; done jobs are deleted, failed ones kept for inspection
+    __tablename__ = 'job'
+    __table_args__ = (
+        # the worker claims the earliest due queued job
+        db.Index('ix_job_run_at_queued', 'run_at', postgresql_where=db.text("status = 'queued'")),
+        # one queued or running job per key, so a job asked for twice runs once
+        db.Index('ix_job_key_queued', 'key', unique=True, postgresql_where=db.text("status = 'queued'")),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    task = db.Column(db.String(120), nullable=False)
+    args = db.Column(JSONB, nullable=False, server_default='{}')
+    key = db.Column(db.String(200))
+    status = db.Column(db.String(20), nullable=False, server_default='queued')
+    run_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    attempts = db.Column(db.Integer, nullable=False, server_default='0')
+    max_attempts = db.Column(db.Integer, nullable=False, server_default='5')
+    last_error = db.Column(db.Text)
+    locked_by = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+
+    def __repr__(self):
+        return f'<Job: {self.id} - {self.task} {self.status}>'
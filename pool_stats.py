@@ -0,0 +1,91 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+#----------------------------------------------------------------------------#
+# Connection pool statistics
+#----------------------------------------------------------------------------#
+
+# Counts checkouts and new connections, and times how long each checkout waited
+# for the pool (including opening a connection when one had to be made) and how
+# long connections were then held. Served at /stats/pool.
+
+
+class PoolStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.engine = None
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.held_total = 0.0
+
+    def init_app(self, app, engine):
+        self.engine = engine
+        self.instrument(engine.pool)
+        app.extensions['pool_stats'] = self
+
+    def instrument(self, pool):
+        connect = pool.connect
+
+        # there is no pool event before a checkout starts, so time the call itself
+        def timed_connect():
+            start = time.perf_counter()
+            try:
+                return connect()
+            except PoolTimeoutError:
+                with self.lock:
+                    self.timeouts += 1
+                raise
+            finally:
+                waited = time.perf_counter() - start
+                with self.lock:
+                    self.wait_total += waited
+                    self.wait_max = max(self.wait_max, waited)
+
+        pool.connect = timed_connect
+
+        @event.listens_for(pool, 'connect')
+        def on_connect(dbapi_connection, connection_record):
+            with self.lock:
+                self.connects += 1
+
+        @event.listens_for(pool, 'checkout')
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            connection_record.info['checked_out_at'] = time.perf_counter()
+            with self.lock:
+                self.checkouts += 1
+
+        @event.listens_for(pool, 'checkin')
+        def on_checkin(dbapi_connection, connection_record):
+            checked_out_at = connection_record.info.pop('checked_out_at', None)
+            if checked_out_at is not None:
+                with self.lock:
+                    self.held_total += time.perf_counter() - checked_out_at
+
+    def stats(self):
+        pool = self.engine.pool if self.engine is not None else None
+        data = {
+            'checkouts': self.checkouts,
+            'connects': self.connects,
+            'timeouts': self.timeouts,
+            'wait_total_ms': round(self.wait_total * 1000, 3),
+            'wait_max_ms': round(self.wait_max * 1000, 3),
+            'wait_avg_ms': round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+            'held_total_ms': round(self.held_total * 1000, 3),
+        }
+        # QueuePool gauges; NullPool (PgBouncer mode) has none
+        for gauge in ('size', 'checkedin', 'checkedout', 'overflow'):
+            if pool is not None and hasattr(pool, gauge):
+                data[gauge] = getattr(pool, gauge)()
+        return data
+
+
+pool_stats = PoolStats()
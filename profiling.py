@@ -0,0 +1,215 @@
+import heapq
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+
+#----------------------------------------------------------------------------#
+# Request profiling
+#----------------------------------------------------------------------------#
+
+# Off unless PROFILING is set. Then every request gets
+#
+#   Server-Timing: app;dur=41.2, db;dur=12.5;desc="9 queries", tpl;dur=20.3
+#
+# and one JSON log line through app.logger once its response has been sent:
+# wall time, SQL statement count and time, template time, and any statement run
+# more than once with the same parameters. Template time is the time spent in
+# render/generate, so it includes queries run while rendering; the header of a
+# streamed response can only cover what ran before the first chunk.
+#
+# With PROFILING_SAMPLE_RATE > 0 that share of requests also runs under a
+# profiler (cProfile, or pyinstrument when PROFILER = 'pyinstrument' and it is
+# installed). Of those, each worker keeps the PROFILING_KEEP slowest in
+# PROFILING_DIR, e.g. 000812ms-shows.shows-4242-1760800000.prof, for
+#
+#   python -m pstats instance/profiles/000812ms-shows.shows-4242-1760800000.prof
+
+
+class RequestTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.statements = Counter()
+        self.profiler = None
+
+    def duplicates(self):
+        return [{'statement': statement[:200], 'count': count}
+            for (statement, _), count in self.statements.most_common() if count > 1]
+
+
+def current_timings():
+    if has_request_context():
+        return g.get('request_timings')
+    return None
+
+
+class TimedTemplate(Template):
+    # adds the time spent rendering to the current request's timings
+
+    def render(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            timings = current_timings()
+            if timings is not None:
+                timings.template_time += time.perf_counter() - start
+
+    def generate(self, *args, **kwargs):
+        chunks = super().generate(*args, **kwargs)
+        while True:
+            start = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                timings = current_timings()
+                if timings is not None:
+                    timings.template_time += time.perf_counter() - start
+            yield chunk
+
+
+class Profiler:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (seconds, path) of the profiles kept, slowest last out
+        self.kept = []
+
+    def init_app(self, app, engine):
+        if not app.config.get('PROFILING'):
+            return
+        self.sample_rate = app.config.get('PROFILING_SAMPLE_RATE', 0.0)
+        self.keep = app.config.get('PROFILING_KEEP', 10)
+        self.directory = app.config.get('PROFILING_DIR')
+        self.kind = app.config.get('PROFILER', 'cprofile')
+        if self.sample_rate and self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+        app.jinja_env.template_class = TimedTemplate
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.teardown_request(self.teardown_request)
+        self.instrument(engine)
+        app.extensions['profiler'] = self
+
+    def instrument(self, engine):
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started_at = conn.info['query_started_at'].pop()
+            timings = current_timings()
+            if timings is not None:
+                timings.sql_count += 1
+                timings.sql_time += time.perf_counter() - started_at
+                timings.statements[statement, repr(parameters)] += 1
+
+    #  Per request
+    #  ----------------------------------------------------------------
+
+    def before_request(self):
+        timings = g.request_timings = RequestTimings()
+        if self.sample_rate and self.directory and random.random() < self.sample_rate:
+            timings.profiler = self.start_profiler()
+
+    def after_request(self, response):
+        timings = g.request_timings
+        elapsed = time.perf_counter() - timings.start
+        if timings.profiler is not None:
+            self.stop_profiler(timings.profiler, elapsed)
+            timings.profiler = None
+
+        response.headers.add('Server-Timing', ', '.join((
+            f'app;dur={elapsed * 1000:.1f}',
+            f'db;dur={timings.sql_time * 1000:.1f};desc="{timings.sql_count} queries"',
+            f'tpl;dur={timings.template_time * 1000:.1f}',
+        )))
+        # logged once the body has gone out, so streamed responses are complete
+        app, endpoint, method, path = current_app._get_current_object(), request.endpoint, request.method, request.full_path
+        status = response.status_code
+        response.call_on_close(lambda: self.log(app, timings, endpoint, method, path, status))
+        return response
+
+    def teardown_request(self, error):
+        # after_request is skipped when a view raises; don't leave a profiler running
+        timings = g.get('request_timings')
+        if timings is not None and timings.profiler is not None:
+            stop = getattr(timings.profiler, 'disable', None) or timings.profiler.stop
+            stop()
+            timings.profiler = None
+
+    def log(self, app, timings, endpoint, method, path, status):
+        duplicates = timings.duplicates()
+        record = {
+            'method': method,
+            'path': path.rstrip('?'),
+            'endpoint': endpoint,
+            'status': status,
+            'duration_ms': round((time.perf_counter() - timings.start) * 1000, 3),
+            'sql_count': timings.sql_count,
+            'sql_ms': round(timings.sql_time * 1000, 3),
+            'template_ms': round(timings.template_time * 1000, 3),
+            'duplicate_queries': duplicates,
+        }
+        # repeated identical queries are what a per-request cache or a join would save
+        (app.logger.warning if duplicates else app.logger.info)(json.dumps(record))
+
+    #  Profiles
+    #  ----------------------------------------------------------------
+
+    def start_profiler(self):
+        if self.kind == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler as Pyinstrument
+            except ImportError:
+                pass
+            else:
+                profiler = Pyinstrument()
+                profiler.start()
+                return profiler
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def stop_profiler(self, profiler, elapsed):
+        # write the profile if it is among the slowest seen, dropping the
+        # fastest of those kept when there are too many
+        if hasattr(profiler, 'disable'):
+            profiler.disable()
+        else:
+            profiler.stop()
+        with self.lock:
+            if len(self.kept) >= self.keep and elapsed <= self.kept[0][0]:
+                return
+            name = f'{round(elapsed * 1000):06d}ms-{request.endpoint}-{os.getpid()}-{int(time.time())}'
+            path = os.path.join(self.directory, name)
+            if hasattr(profiler, 'dump_stats'):
+                path += '.prof'
+                profiler.dump_stats(path)
+            else:
+                path += '.html'
+                with open(path, 'w') as f:
+                    f.write(profiler.output_html())
+            heapq.heappush(self.kept, (elapsed, path))
+            if len(self.kept) > self.keep:
+                _, dropped = heapq.heappop(self.kept)
+                try:
+                    os.remove(dropped)
+                except OSError:
+                    pass
+
+
+profiler = Profiler()
@@ -0,0 +1,537 @@
+import re
+from datetime import datetime, time, timedelta
+from itertools import groupby
+
+from sqlalchemy import literal, tuple_, union_all
+from sqlalchemy.orm import contains_eager
+
+from cache import cache
+from models import Artist, Venue, Show, VenueShowCounts, ArtistShowCounts, TableVersion, db
+
+#----------------------------------------------------------------------------#
+# Queries
+#----------------------------------------------------------------------------#
+
+# Data access for the views. Each function returns plain dicts shaped the way
+# the templates expect them, and does its work in a fixed number of queries.
+# Results of the page queries are cached until one of the tables they read from
+# changes, or, for those splitting shows into upcoming and past, until the next
+# of their upcoming shows starts (see cache.py).
+
+PAST_SHOWS_PER_PAGE = 12
+SHOWS_PER_PAGE = 30
+STREAM_BATCH_SIZE = 500
+SEARCH_RESULTS_PER_PAGE = 50
+# what name_fold() in the database takes for whitespace
+WHITESPACE = re.compile('[ \t\n\r\f\v]+')
+
+
+def is_upcoming():
+    return Show.start_time > db.func.now()
+
+
+def is_past():
+    return Show.start_time <= db.func.now()
+
+
+def counts_fk(counts):
+    return counts.venue_id if counts is VenueShowCounts else counts.artist_id
+
+
+def num_upcoming_shows(counts):
+    # the upcoming show count of the outer-joined counts row; venues and artists
+    # that never had a show have none
+    return db.func.coalesce(counts.upcoming_shows_count, 0)
+
+
+def show_counts(counts, id):
+    # (upcoming_shows_count, past_shows_count, next_show_at) of one venue or
+    # artist, from its counts row
+    row = db.session.query(counts.upcoming_shows_count, counts.past_shows_count, counts.next_show_at
+        ).filter(counts_fk(counts) == id).first()
+    return tuple(row) if row else (0, 0, None)
+
+
+def page_count(total, per_page):
+    return max(1, -(-total // per_page))
+
+
+def earliest(*times):
+    return min((time for time in times if time is not None), default=None)
+
+
+def areas_changes_at(areas):
+    # the counts are recounted once a venue's next show has started
+    return earliest(*(venue['next_show_at'] for area in areas for venue in area['venues']))
+
+
+def detail_changes_at(detail, *args, **kwargs):
+    # the first upcoming show starting moves it to the past shows, and the
+    # counts row is recounted after its next_show_at
+    if detail is None:
+        return None
+    first = detail['upcoming_shows'][0]['start_time'] if detail['upcoming_shows'] else None
+    return earliest(first, detail['next_show_at'])
+
+
+@cache.cached(depends_on=('venue', 'show', 'venue_show_counts'), changes_at=areas_changes_at)
+def venue_areas():
+    # venues grouped by (state, city), with the number of upcoming shows per venue.
+    # one query joining each venue to its counts row; the database does the
+    # ordering, so the rows only need to be split into areas as they stream past.
+    rows = db.session.query(
+            Venue.state,
+            Venue.city,
+            Venue.id,
+            Venue.name,
+            Venue.updated_at,
+            num_upcoming_shows(VenueShowCounts).label('num_upcoming_shows'),
+            VenueShowCounts.next_show_at
+        ).outerjoin(VenueShowCounts, VenueShowCounts.venue_id == Venue.id
+        ).order_by(Venue.state, Venue.city, Venue.name, Venue.id
+        ).all()
+
+    data = []
+    for (state, city), venues in groupby(rows, key=lambda row: (row.state, row.city)):
+        data.append({
+            'city': city,
+            'state': state,
+            'venues': [{
+                'id': venue.id,
+                'name': venue.name,
+                'updated_at': venue.updated_at,
+                'num_upcoming_shows': venue.num_upcoming_shows,
+                'next_show_at': venue.next_show_at
+            } for venue in venues]
+        })
+    return data
+
+
+@cache.cached(depends_on=('artist',))
+def artist_list():
+    return [{'id': row.id, 'name': row.name, 'updated_at': row.updated_at}
+        for row in db.session.query(Artist.id, Artist.name, Artist.updated_at
+            ).order_by(Artist.name, Artist.id)]
+
+
+@cache.cached(depends_on=('venue', 'show', 'artist', 'venue_show_counts'), changes_at=detail_changes_at)
+def venue_detail(venue_id, past_page=1):
+    # the venue page: the venue row, its counts row and one joined query each
+    # for upcoming and (one page of) past shows.
+    venue = Venue.query.get(venue_id)
+    if venue is None:
+        return None
+
+    upcoming_count, past_count, next_show_at = show_counts(VenueShowCounts, venue_id)
+    shows = Show.query.join(Show.artist).options(contains_eager(Show.artist)
+        ).filter(Show.venue_id == venue_id)
+
+    def show_info(show):
+        return {
+            'artist_id': show.artist_id,
+            'artist_name': show.artist.name,
+            'artist_image_link': show.artist.image_link,
+            'start_time': show.start_time
+        }
+
+    upcoming_shows = shows.filter(is_upcoming()).order_by(Show.start_time, Show.id).all()
+    past_shows = shows.filter(is_past()).order_by(Show.start_time.desc(), Show.id.desc()
+        ).offset((past_page - 1) * PAST_SHOWS_PER_PAGE).limit(PAST_SHOWS_PER_PAGE).all()
+
+    return {
+        "id": venue.id,
+        "name": venue.name,
+        "genres": venue.genres or [],
+        "city": venue.city,
+        "state": venue.state,
+        "address": venue.address,
+        "phone": venue.phone,
+        'website': venue.website,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "image_link": venue.image_link,
+        "seeking_description": venue.seeking_description,
+        "past_shows": [show_info(show) for show in past_shows],
+        "upcoming_shows": [show_info(show) for show in upcoming_shows],
+        "past_shows_count": past_count,
+        "upcoming_shows_count": upcoming_count,
+        "next_show_at": next_show_at,
+        "past_page": past_page,
+        "past_pages": page_count(past_count, PAST_SHOWS_PER_PAGE),
+    }
+
+
+@cache.cached(depends_on=('artist', 'show', 'venue', 'artist_show_counts'), changes_at=detail_changes_at)
+def artist_detail(artist_id, past_page=1):
+    # the artist page, loaded the same way as venue_detail
+    artist = Artist.query.get(artist_id)
+    if artist is None:
+        return None
+
+    upcoming_count, past_count, next_show_at = show_counts(ArtistShowCounts, artist_id)
+    shows = Show.query.join(Show.venue).options(contains_eager(Show.venue)
+        ).filter(Show.artist_id == artist_id)
+
+    def show_info(show):
+        return {
+            'venue_id': show.venue_id,
+            'venue_name': show.venue.name,
+            'venue_image_link': show.venue.image_link,
+            'start_time': show.start_time
+        }
+
+    upcoming_shows = shows.filter(is_upcoming()).order_by(Show.start_time, Show.id).all()
+    past_shows = shows.filter(is_past()).order_by(Show.start_time.desc(), Show.id.desc()
+        ).offset((past_page - 1) * PAST_SHOWS_PER_PAGE).limit(PAST_SHOWS_PER_PAGE).all()
+
+    return {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genres or [],
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        'website': artist.website,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "image_link": artist.image_link,
+        "seeking_description": artist.seeking_description,
+        "past_shows": [show_info(show) for show in past_shows],
+        "upcoming_shows": [show_info(show) for show in upcoming_shows],
+        "past_shows_count": past_count,
+        "upcoming_shows_count": upcoming_count,
+        "next_show_at": next_show_at,
+        "past_page": past_page,
+        "past_pages": page_count(past_count, PAST_SHOWS_PER_PAGE),
+    }
+
+
+def show_listing(after=None, upcoming=True, genre=None, city=None, state=None):
+    # shows with their artist and venue fields from one joined query, ordered by
+    # (start_time, id) so the listing can be paged with a keyset instead of OFFSET.
+    # after is the (start_time, id) of the last show already seen. genre filters on
+    # the artist's genres (answered from the GIN index), city and state on the venue.
+    query = db.session.query(
+            Show.id,
+            Show.start_time,
+            Show.venue_id,
+            Venue.name.label('venue_name'),
+            Show.artist_id,
+            Artist.name.label('artist_name'),
+            Artist.image_link.label('artist_image_link'),
+            # a show tile changes with its artist and venue too
+            db.func.greatest(Show.updated_at, Artist.updated_at, Venue.updated_at).label('updated_at')
+        ).join(Artist, Artist.id == Show.artist_id
+        ).join(Venue, Venue.id == Show.venue_id)
+
+    if upcoming:
+        query = query.filter(is_upcoming())
+    if genre:
+        query = query.filter(Artist.genres.contains([genre]))
+    if city:
+        query = query.filter(Venue.city == city)
+    if state:
+        query = query.filter(Venue.state == state)
+    if after is not None:
+        query = query.filter(tuple_(Show.start_time, Show.id) > tuple_(*after))
+    return query.order_by(Show.start_time, Show.id)
+
+
+def page_changes_at(page, after=None, upcoming=True, **kwargs):
+    # its first show starting takes it off the upcoming listing
+    rows, _ = page
+    return rows[0]['start_time'] if upcoming and rows else None
+
+
+@cache.cached(depends_on=('show', 'artist', 'venue'), changes_at=page_changes_at)
+def show_page(after=None, upcoming=True, per_page=SHOWS_PER_PAGE, **filters):
+    # one page of the listing, plus the keyset of its last row when there is a next page
+    rows = show_listing(after, upcoming, **filters).limit(per_page + 1).all()
+    next_key = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_key = (rows[-1].start_time, rows[-1].id)
+    return [show_row(row) for row in rows], next_key
+
+
+def iter_shows(upcoming=True, **filters):
+    # the whole listing, fetched in batches through a server-side cursor so it
+    # is never held in memory at once
+    for row in show_listing(upcoming=upcoming, **filters).yield_per(STREAM_BATCH_SIZE):
+        yield show_row(row)
+
+
+def show_row(row):
+    return {
+        'id': row.id,
+        'venue_id': row.venue_id,
+        'venue_name': row.venue_name,
+        'artist_id': row.artist_id,
+        'artist_name': row.artist_name,
+        'artist_image_link': row.artist_image_link,
+        'start_time': row.start_time,
+        'updated_at': row.updated_at
+    }
+
+
+#  Calendar
+#  ----------------------------------------------------------------
+
+CALENDAR_UNITS = ('day', 'week', 'month')
+# each bucket is split into slots of this unit
+CALENDAR_SLOTS = {'day': 'hour', 'week': 'day', 'month': 'day'}
+
+
+def calendar_range(unit, day):
+    # [start, end) of the day, week or month holding day, the way date_trunc
+    # cuts them (weeks start on Monday)
+    if unit == 'day':
+        start = day
+    elif unit == 'week':
+        start = day - timedelta(days=day.weekday())
+    else:
+        start = day.replace(day=1)
+    if unit == 'month':
+        end = (start + timedelta(days=32)).replace(day=1)
+    else:
+        end = start + timedelta(days=1 if unit == 'day' else 7)
+    return datetime.combine(start, time()), datetime.combine(end, time())
+
+
+@cache.cached(depends_on=('show', 'artist', 'venue'))
+def calendar_bucket(unit, start, **filters):
+    # the shows of one calendar bucket, start being the bucket's first moment, as
+    # [{'start', 'shows'}] per slot. the bucket is a start_time range, so it comes
+    # from the start_time index; date_trunc only labels the rows with their slot.
+    # cached per bucket, so the weeks everyone looks at are served from memory
+    start, end = calendar_range(unit, start.date())
+    slot = db.func.date_trunc(CALENDAR_SLOTS[unit], Show.start_time).label('slot')
+    rows = show_listing(upcoming=False, **filters).add_columns(slot).filter(
+        Show.start_time >= start, Show.start_time < end).all()
+    return [{'start': slot_start, 'shows': [show_row(row) for row in slot_rows]}
+        for slot_start, slot_rows in groupby(rows, key=lambda row: row.slot)]
+
+
+def like_pattern(term, prefix=False):
+    # '%term%', or 'term%' for a prefix, with LIKE wildcards in the term itself escaped
+    escaped = term.replace('/', '//').replace('%', '/%').replace('_', '/_')
+    return f'{escaped}%' if prefix else f'%{escaped}%'
+
+
+def search(model, counts, term, page=1, per_page=SEARCH_RESULTS_PER_PAGE):
+    # ranked search over name, genres, city and state. rows match either the
+    # full-text query against search_vector (GIN index), e.g. "Jazz in San Francisco"
+    # or "San Francisco, CA", or a case-insensitive partial match on the name
+    # (trigram index), e.g. "hop". full-text matches rank by ts_rank, then by name.
+    # num_upcoming_shows comes from the counts table and the total match count
+    # from a window over the same query.
+    tsquery = db.func.websearch_to_tsquery('english', term)
+    rank = db.func.ts_rank(model.search_vector, tsquery)
+    rows = db.session.query(
+            model.id,
+            model.name,
+            num_upcoming_shows(counts).label('num_upcoming_shows'),
+            db.func.count().over().label('total')
+        ).outerjoin(counts, counts_fk(counts) == model.id
+        ).filter(db.or_(
+            model.search_vector.op('@@')(tsquery),
+            model.name.ilike(like_pattern(term), escape='/')
+        )).order_by(rank.desc(), model.name, model.id
+        ).offset((page - 1) * per_page).limit(per_page).all()
+
+    count = rows[0].total if rows else 0
+    return {
+        "count": count,
+        "page": page,
+        "pages": page_count(count, per_page),
+        "data": [{
+            'id': row.id,
+            'name': row.name,
+            'num_upcoming_shows': row.num_upcoming_shows
+        } for row in rows]
+    }
+
+
+def search_venues(term, page=1):
+    return search(Venue, VenueShowCounts, term, page)
+
+
+def search_artists(term, page=1):
+    return search(Artist, ArtistShowCounts, term, page)
+
+
+def fold(name):
+    # the case- and whitespace-insensitive form names are matched on: lower
+    # case, each run of whitespace one space, none at either end. the
+    # name_fold() SQL function does the same, for the name_fold(name) indexes
+    return WHITESPACE.sub(' ', name.lower()).strip(' ')
+
+
+def name_prefix(model, prefix, limit):
+    # names starting with prefix, as the typeahead matches them in memory.
+    # it uses this when a table is too big to keep there: the prefix is a
+    # range of the name_fold(name) text_pattern_ops index, read in that
+    # index's (byte) order so the scan stops after limit rows, however short
+    # the prefix
+    rows = db.session.query(model.id, model.name
+        ).filter(db.func.name_fold(model.name).like(like_pattern(fold(prefix), prefix=True), escape='/')
+        ).order_by(db.literal_column(f'name_fold({model.__tablename__}.name) USING ~<~'), model.id
+        ).limit(limit)
+    return [{'id': row.id, 'name': row.name} for row in rows]
+
+
+#  Availability
+#  ----------------------------------------------------------------
+
+def free_slots(model, id, start, end, min_length):
+    # gaps of at least min_length (a timedelta) between start and end in the
+    # bookings of one venue or artist, as [{'start', 'end'}]. the bookings come
+    # from the GiST index behind the no-overlap constraint, and since they never
+    # overlap, each gap runs from one show's end to the next one's start
+    fk = Show.venue_id if model is Venue else Show.artist_id
+    window = db.func.tsrange(literal(start), literal(end))
+    booked = db.session.query(Show.start_time, Show.end_time).filter(
+        fk == id,
+        Show.start_time.isnot(None),
+        db.func.tsrange(Show.start_time, Show.end_time).op('&&')(window),
+    ).subquery()
+
+    previous_end = db.func.lag(booked.c.end_time).over(order_by=booked.c.start_time)
+    gaps = union_all(
+        db.select(db.func.coalesce(previous_end, literal(start)).label('free_from'),
+            booked.c.start_time.label('free_until')),
+        db.select(db.func.coalesce(db.func.max(booked.c.end_time), literal(start)), literal(end)),
+    ).subquery()
+
+    free_from = db.func.greatest(gaps.c.free_from, literal(start))
+    free_until = db.func.least(gaps.c.free_until, literal(end))
+    rows = db.session.query(free_from, free_until).filter(
+        free_until - free_from >= min_length
+    ).order_by(free_from).all()
+    return [{'start': row[0], 'end': row[1]} for row in rows]
+
+
+#  Freshness
+#  ----------------------------------------------------------------
+
+# Validators for conditional GET (the ETag), read without touching the rows a
+# page shows. table_version is bumped by a trigger on every write to a table,
+# so its version stands for every row of it, deletes included, and reading it
+# is a primary key lookup. Upcoming shows pass without a write, so pages
+# showing them add the start of the next one, and the counts rows that
+# refresh-counts recounts after it.
+
+def table_version(model):
+    # bumped by every write to model's table, see TableVersion
+    return db.session.query(TableVersion.version).filter(
+        TableVersion.table_name == model.__tablename__).scalar()
+
+
+def version_column(table):
+    return db.session.query(TableVersion.version).filter(TableVersion.table_name == table).scalar_subquery()
+
+
+def next_change(model):
+    # when the page data of model changes next without a write, if it can
+    if model is Show:
+        return db.session.query(db.func.min(Show.start_time)).filter(is_upcoming()).scalar_subquery()
+    if model in (VenueShowCounts, ArtistShowCounts):
+        return db.session.query(db.func.min(model.next_show_at)).scalar_subquery()
+    return None
+
+
+def list_freshness(*models):
+    columns = [version_column(model.__tablename__) for model in models if hasattr(model, 'updated_at')]
+    columns.extend(column for column in map(next_change, models) if column is not None)
+    return tuple(db.session.query(*columns).one())
+
+
+def detail_freshness(model, counts, id):
+    # a venue or artist page shows the three tables' rows, its counts row
+    # and its shows split at the next one to start (from the (venue_id |
+    # artist_id, start_time) index); None when there is no such venue or artist
+    fk = Show.venue_id if model is Venue else Show.artist_id
+    next_show = db.session.query(db.func.min(Show.start_time)).filter(fk == id, is_upcoming()).scalar_subquery()
+    row = db.session.query(
+            *map(version_column, ('artist', 'venue', 'show')),
+            model.id,
+            counts.upcoming_shows_count,
+            counts.past_shows_count,
+            counts.next_show_at,
+            next_show
+        ).outerjoin(counts, counts_fk(counts) == model.id
+        ).filter(model.id == id).first()
+    return None if row is None else tuple(row)
+
+
+def venue_freshness(venue_id):
+    return detail_freshness(Venue, VenueShowCounts, venue_id)
+
+
+def artist_freshness(artist_id):
+    return detail_freshness(Artist, ArtistShowCounts, artist_id)
+
+
+#  Field selections
+#  ----------------------------------------------------------------
+
+# Flat rows of chosen fields, for the JSON API and the exports. Only the
+# columns asked for are selected, and rows come back as tuples, not objects.
+
+# field name -> column, per resource. show fields from artist/venue add a join.
+FIELDS = {
+    'artists': (Artist, {
+        'id': Artist.id,
+        'name': Artist.name,
+        'city': Artist.city,
+        'state': Artist.state,
+        'phone': Artist.phone,
+        'genres': Artist.genres,
+        'website': Artist.website,
+        'facebook_link': Artist.facebook_link,
+        'image_link': Artist.image_link,
+        'seeking_venue': Artist.seeking_venue,
+        'seeking_description': Artist.seeking_description,
+        'updated_at': Artist.updated_at,
+    }),
+    'venues': (Venue, {
+        'id': Venue.id,
+        'name': Venue.name,
+        'city': Venue.city,
+        'state': Venue.state,
+        'address': Venue.address,
+        'phone': Venue.phone,
+        'genres': Venue.genres,
+        'website': Venue.website,
+        'facebook_link': Venue.facebook_link,
+        'image_link': Venue.image_link,
+        'seeking_talent': Venue.seeking_talent,
+        'seeking_description': Venue.seeking_description,
+        'updated_at': Venue.updated_at,
+    }),
+    'shows': (Show, {
+        'id': Show.id,
+        'start_time': Show.start_time,
+        'duration': Show.duration,
+        'end_time': Show.end_time,
+        'artist_id': Show.artist_id,
+        'artist_name': Artist.name,
+        'artist_image_link': Artist.image_link,
+        'venue_id': Show.venue_id,
+        'venue_name': Venue.name,
+        'venue_image_link': Venue.image_link,
+        'updated_at': Show.updated_at,
+    }),
+}
+
+
+def field_query(resource, names):
+    # query selecting the names fields of resource, labelled with their names
+    model, columns = FIELDS[resource]
+    query = db.session.query(*(columns[name].label(name) for name in names)).select_from(model)
+    if model is Show:
+        if any(name.startswith('artist_') and name != 'artist_id' for name in names):
+            query = query.join(Artist, Artist.id == Show.artist_id)
+        if any(name.startswith('venue_') and name != 'venue_id' for name in names):
+            query = query.join(Venue, Venue.id == Show.venue_id)
+    return query
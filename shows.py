@@ -0,0 +1,131 @@
+import datetime
+import json
+import traceback
+
+from flask import Blueprint, render_template, request, Response, flash, url_for, abort, \
+    stream_with_context, stream_template
+
+import counters
+import queries
+from dates import stored_now
+from http_caching import conditional
+from models import Artist, Venue, Show, db
+
+#----------------------------------------------------------------------------#
+# Shows
+#----------------------------------------------------------------------------#
+
+bp = Blueprint('shows', __name__)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@bp.route('/shows')
+def shows():
+    # displays list of shows at /shows
+    #   ?scope=all            include past shows (default is upcoming only)
+    #   ?after=<time>,<id>    keyset cursor, taken from the "next" link of the previous page
+    #   ?format=json          stream the whole listing as a JSON array
+    #   ?stream=1             stream the whole listing as HTML
+    #   ?genre=&city=&state=  e.g. upcoming Rock n Roll shows in New York, NY
+    upcoming = request.args.get('scope', 'upcoming') != 'all'
+    filters = {key: request.args.get(key) for key in ('genre', 'city', 'state')}
+
+    if request.args.get('format') == 'json':
+        def generate():
+            yield '['
+            for i, show in enumerate(queries.iter_shows(upcoming, **filters)):
+                yield (',' if i else '') + json.dumps(show, default=str)
+            yield ']'
+        return Response(stream_with_context(generate()), mimetype='application/json')
+
+    if request.args.get('stream'):
+        return stream_template('pages/shows.html', shows=queries.iter_shows(upcoming, **filters),
+            fragment_cache=False)
+
+    after = None
+    if request.args.get('after'):
+        try:
+            start_time, show_id = request.args['after'].rsplit(',', 1)
+            after = (datetime.datetime.fromisoformat(start_time), int(show_id))
+        except ValueError:
+            abort(400)
+
+    def render():
+        data, next_key = queries.show_page(after, upcoming, **filters)
+        next_url = None
+        if next_key:
+            next_url = url_for('shows.shows', scope=request.args.get('scope'), **filters,
+                after=f'{next_key[0].isoformat()},{next_key[1]}')
+        return render_template('pages/shows.html', shows=data, next_url=next_url)
+
+    return conditional(queries.list_freshness(Show, Artist, Venue), render)
+
+@bp.route('/shows/calendar')
+def calendar():
+    # shows in one day, week or month, split into hours or days
+    #   ?unit=day|week|month   default week
+    #   ?date=YYYY-MM-DD       any day in the wanted bucket, default today
+    #   ?genre=&city=&state=   e.g. what's on this weekend in Austin, TX
+    #   ?format=json
+    unit = request.args.get('unit', 'week')
+    if unit not in queries.CALENDAR_UNITS:
+        abort(400)
+    try:
+        day = datetime.date.fromisoformat(request.args['date']) if request.args.get('date') else stored_now().date()
+    except ValueError:
+        abort(400)
+    filters = {key: request.args.get(key) for key in ('genre', 'city', 'state') if request.args.get(key)}
+    start, end = queries.calendar_range(unit, day)
+
+    def render():
+        slots = queries.calendar_bucket(unit, start, **filters)
+        if request.args.get('format') == 'json':
+            return Response(json.dumps({
+                'unit': unit,
+                'start': start.isoformat(),
+                'end': end.isoformat(),
+                'slots': [{'start': slot['start'].isoformat(), 'shows': slot['shows']} for slot in slots],
+            }, default=str), mimetype='application/json')
+        previous_start = queries.calendar_range(unit, (start - datetime.timedelta(days=1)).date())[0]
+        return render_template('pages/calendar.html', unit=unit, start=start,
+            last_day=end - datetime.timedelta(days=1), slots=slots,
+            previous_url=url_for('shows.calendar', unit=unit, date=previous_start.date().isoformat(), **filters),
+            next_url=url_for('shows.calendar', unit=unit, date=end.date().isoformat(), **filters))
+
+    return conditional(queries.list_freshness(Show, Artist, Venue), render)
+
+@bp.route('/shows/create')
+def create_shows():
+    # renders form. do not touch.
+    from forms import ShowForm
+    form = ShowForm()
+    return render_template('forms/new_show.html', form=form)
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+    # called to create new shows in the db, upon submitting new show listing form
+    # TODO: insert form data as a new Show record in the db, instead
+    try:
+        artist_id = request.form.get('artist_id')
+        venue_id = request.form.get('venue_id')
+        start_time = request.form.get('start_time')
+        duration = request.form.get('duration', 120, type=int)
+        db.session.add(Show(artist_id=artist_id, venue_id=venue_id, start_time=start_time, duration=duration))
+        # committed with the show; the worker moves it from upcoming to past once it starts
+        counters.refresh_at(start_time)
+        db.session.commit()
+        # on successful db insert, flash success
+        flash('Show was successfully listed!')
+    except Exception as e:
+        # TODO: on unsuccessful db insert, flash an error instead.
+        traceback.print_exc()
+        db.session.rollback()
+        orig = getattr(e, 'orig', None)
+        if getattr(orig, 'pgcode', None) == '23P01': # psycopg2 ExclusionViolation
+            booked = 'venue' if orig.diag.constraint_name == 'show_venue_id_no_overlap' else 'artist'
+            flash(f'An error occurred. The {booked} is already booked at that time.')
+        else:
+            flash('An error occurred. Show could not be listed.')
+
+    return render_template('pages/home.html')
@@ -2,3 +2,62 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// the server shows dates in this timezone (see dates.py)
+(function rememberTimezone() {
+  var zone = window.Intl && Intl.DateTimeFormat().resolvedOptions().timeZone;
+  if (zone && document.cookie.indexOf('tz=' + zone) === -1) {
+    document.cookie = 'tz=' + zone + ';path=/;max-age=31536000;samesite=lax';
+  }
+})();
+
+// typeahead pickers: an input with data-typeahead="<url>" suggests names from
+// that endpoint and puts the id of the one picked into the data-typeahead-target field
+(function typeahead() {
+  var inputs = document.querySelectorAll('input[data-typeahead]');
+  Array.prototype.forEach.call(inputs, function (input) {
+    var target = document.getElementById(input.getAttribute('data-typeahead-target'));
+    var list = document.createElement('datalist');
+    var timer = null;
+    var last = null;
+    list.id = input.id + '-suggestions';
+    input.parentNode.insertBefore(list, input.nextSibling);
+    input.setAttribute('list', list.id);
+
+    function pick() {
+      // suggestions read "Name #id"
+      var match = /#(\d+)$/.exec(input.value);
+      if (match && target) {
+        target.value = match[1];
+      }
+    }
+
+    function suggest() {
+      var prefix = input.value.trim();
+      if (!prefix || prefix === last || /#\d+$/.test(prefix)) {
+        return;
+      }
+      last = prefix;
+      fetch(input.getAttribute('data-typeahead') + '?q=' + encodeURIComponent(prefix))
+        .then(function (response) { return response.json(); })
+        .then(function (body) {
+          if (prefix !== last) {
+            return;
+          }
+          list.innerHTML = '';
+          body.data.forEach(function (item) {
+            var option = document.createElement('option');
+            option.value = item.name + ' #' + item.id;
+            list.appendChild(option);
+          });
+        });
+    }
+
+    input.addEventListener('input', function () {
+      pick();
+      clearTimeout(timer);
+      timer = setTimeout(suggest, 120);
+    });
+    input.addEventListener('change', pick);
+  });
+})();
@@ -0,0 +1,72 @@
+#----------------------------------------------------------------------------#
+# Test fixtures
+#----------------------------------------------------------------------------#
+
+# The tests run against a real Postgres database, TEST_DATABASE_URL (the local
+# fyyur_test by default), as the views lean on its triggers, constraints and
+# indexes. It is migrated once per run and emptied before every test that seeds
+# it; don't point it at a database whose data you want to keep.
+#
+#   createdb fyyur_test
+#   TEST_DATABASE_URL=postgresql://postgres:<password>@localhost:5432/fyyur_test \
+#       python -m pytest -q
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from flask_migrate import upgrade
+
+from app import create_app
+from models import Artist, Show, Venue, db
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+CITIES = (('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'))
+GENRES = ('Jazz', 'Blues', 'Rock n Roll', 'Folk')
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app('testing')
+    # no app context is held between requests: a request made inside one
+    # reuses its session, and with it one transaction and one now()
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def seed(app):
+    # seed(venues, artists) empties the database and fills it with that many
+    # venues and artists. artist i plays venue i % venues once i + 1 days ago
+    # and once i + 1 days from now, so every page has past and upcoming shows
+    # and no two shows overlap. returns the first venue's and artist's ids
+    def seed(venues=3, artists=6):
+        with app.app_context():
+            db.session.execute(db.text('TRUNCATE show, venue, artist, job RESTART IDENTITY CASCADE'))
+            venue_rows = [Venue(name=f'The Musical Hop {i}', city=CITIES[i % len(CITIES)][0],
+                state=CITIES[i % len(CITIES)][1], genres=[GENRES[i % len(GENRES)]]) for i in range(venues)]
+            artist_rows = [Artist(name=f'The Velvet Jazz {i}', city=CITIES[i % len(CITIES)][0],
+                state=CITIES[i % len(CITIES)][1], genres=[GENRES[i % len(GENRES)]]) for i in range(artists)]
+            db.session.add_all(venue_rows + artist_rows)
+            db.session.flush()
+            now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+            for i, artist in enumerate(artist_rows):
+                venue = venue_rows[i % venues]
+                db.session.add_all([
+                    Show(artist_id=artist.id, venue_id=venue.id, start_time=now - timedelta(days=i + 1)),
+                    Show(artist_id=artist.id, venue_id=venue.id, start_time=now + timedelta(days=i + 1)),
+                ])
+            db.session.commit()
+            return venue_rows[0].id, artist_rows[0].id
+    return seed
+
+
+@pytest.fixture
+def seeded(seed):
+    return seed()
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+import pytest
+
+from dates import format_datetime
+from tests.test_views import VIEWS
+
+# timings with pytest-benchmark; skipped when it isn't installed.
+# benchmarks/views.py times the views on production-sized data
+pytest.importorskip('pytest_benchmark')
+
+# a long page of shows, one |datetime each
+START_TIMES = [datetime(2026, 1, 1, 20) + timedelta(hours=7 * i) for i in range(500)]
+
+
+@pytest.mark.parametrize('method, path, data', [view[1:4] for view in VIEWS],
+    ids=[view[0] for view in VIEWS])
+def test_view_time(benchmark, client, seeded, method, path, data):
+    client.open(path, method=method, data=data)
+    benchmark(lambda: client.open(path, method=method, data=data).close())
+
+
+def old_format_datetime(value, format='medium'):
+    # what the filter did before: views passed str(start_time), which was
+    # parsed back with dateutil, and Babel parsed the pattern on every call
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+@pytest.mark.parametrize('cookie', [None, 'tz=America/Chicago'], ids=['as stored', 'user timezone'])
+def test_format_datetime_time(benchmark, app, cookie):
+    with app.test_request_context(headers={'Cookie': cookie} if cookie else {}):
+        benchmark(lambda: [format_datetime(value, 'full') for value in START_TIMES])
+
+
+def test_old_format_datetime_time(benchmark, app):
+    strings = [str(value) for value in START_TIMES]
+    with app.test_request_context():
+        benchmark(lambda: [old_format_datetime(value, 'full') for value in strings])
@@ -0,0 +1,82 @@
+import time
+from datetime import timedelta
+
+import pytest
+
+import queries
+from cache import LRUBackend, RedisBackend, cache
+from dates import stored_now
+from models import Show, Venue, db
+
+
+@pytest.fixture
+def redis_cache(app):
+    # the redis backend over the in-memory client, in place of the testing
+    # config's null backend
+    backend, cache.backend = cache.backend, RedisBackend.from_url('memory://')
+    yield cache
+    cache.backend = backend
+
+
+@pytest.fixture
+def lru_cache(app):
+    backend, cache.backend = cache.backend, LRUBackend()
+    yield cache
+    cache.backend = backend
+
+
+def venue_names():
+    return [venue['name'] for area in queries.venue_areas() for venue in area['venues']]
+
+
+def test_cached_reads_hit(app, seeded, redis_cache):
+    with app.app_context():
+        names = venue_names()
+        hits = cache.hits
+        assert venue_names() == names
+        assert cache.hits == hits + 1
+
+
+def test_commit_invalidates(app, seeded, redis_cache):
+    with app.app_context():
+        assert 'The Musical Hop 0' in venue_names()
+        version, = cache.versions(['venue'])
+        db.session.get(Venue, 1).name = 'The Musical Stop'
+        db.session.commit()
+        assert cache.versions(['venue']) == [version + 1]
+        assert 'The Musical Stop' in venue_names()
+
+
+def test_rollback_keeps_versions(app, seeded, redis_cache):
+    with app.app_context():
+        names = venue_names()
+        versions = cache.versions(['venue'])
+        db.session.get(Venue, 1).name = 'The Musical Stop'
+        db.session.flush()
+        db.session.rollback()
+        assert cache.versions(['venue']) == versions
+        hits = cache.hits
+        assert venue_names() == names
+        assert cache.hits == hits + 1
+
+
+def test_show_starting_changes_cached_pages(app, client, seeded, lru_cache):
+    # no write happens when a show starts, so no table version moves
+    with app.app_context():
+        start = stored_now().replace(microsecond=0) + timedelta(seconds=2)
+        db.session.add(Show(artist_id=2, venue_id=1, start_time=start))
+        db.session.commit()
+        assert queries.venue_detail(1)['upcoming_shows'][0]['start_time'] == start
+        assert queries.show_page()[0][0]['start_time'] == start
+        wait = (start - stored_now()).total_seconds() + 0.5
+
+    venue = client.get('/venues/1')
+    shows = client.get('/shows')
+    time.sleep(wait)
+
+    with app.app_context():
+        assert start not in [show['start_time'] for show in queries.venue_detail(1)['upcoming_shows']]
+        assert start in [show['start_time'] for show in queries.venue_detail(1)['past_shows']]
+        assert queries.show_page()[0][0]['start_time'] > start
+    assert client.get('/venues/1', headers={'If-None-Match': venue.headers['ETag']}).status_code == 200
+    assert client.get('/shows').data != shows.data
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+
+import babel.dates
+import pytest
+from flask import Flask
+from sqlalchemy import create_engine
+
+import dates
+import queries
+from dates import format_datetime
+from models import db
+
+
+@pytest.fixture
+def far_east_engine(app):
+    # an engine set up for TIMEZONE = 'Pacific/Kiritimati' (UTC+14), whatever
+    # zone the database server is in
+    far_east = Flask(__name__)
+    far_east.config['TIMEZONE'] = 'Pacific/Kiritimati'
+    engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+    dates.init_app(far_east, engine)
+    yield engine
+    engine.dispose()
+
+
+def test_sessions_use_the_stored_timezone(app, far_east_engine):
+    with app.app_context():
+        assert db.session.execute(db.text('SHOW TimeZone')).scalar() == 'UTC'
+
+    for _ in range(2):
+        # and keep it across the pool's rollback
+        with far_east_engine.connect() as connection:
+            assert connection.exec_driver_sql('SHOW TimeZone').scalar() == 'Pacific/Kiritimati'
+
+
+def test_upcoming_compares_in_the_stored_timezone(far_east_engine):
+    far_east_now = datetime.now(dates.zone('Pacific/Kiritimati')).replace(tzinfo=None)
+    with far_east_engine.connect() as connection:
+        for start, upcoming in ((far_east_now - timedelta(hours=1), False),
+                (far_east_now + timedelta(hours=1), True)):
+            assert connection.execute(db.select(db.literal(start) > db.func.now())).scalar() is upcoming
+
+
+def test_calendar_defaults_to_stored_today(app, client, seeded):
+    with app.app_context():
+        week = queries.calendar_range('week', dates.stored_now().date())[0]
+    assert client.get('/shows/calendar?format=json').json['start'] == week.isoformat()
+
+
+@pytest.mark.parametrize('format', ['full', 'medium', 'EEEE d MMMM'])
+def test_format_datetime_matches_babel(app, format):
+    # the cached pattern formats as Babel does from the pattern string
+    values = [datetime(2026, 1, 1, 20) + timedelta(hours=7 * i, minutes=i) for i in range(50)]
+    with app.test_request_context():
+        for value in values:
+            assert format_datetime(value, format) == \
+                babel.dates.format_datetime(value, dates.FORMATS.get(format, format), locale='en')
+            assert format_datetime(str(value), format) == format_datetime(value, format)
+    assert dates.pattern(format) is dates.pattern(format)
+
+
+def test_format_datetime(app):
+    value = datetime(2026, 1, 1, 20)
+    with app.test_request_context():
+        assert format_datetime(value, 'full') == 'Thursday January, 1, 2026 at 8:00PM'
+        assert format_datetime(value) == 'Thu 01, 01, 2026 8:00PM'
+        assert format_datetime(None) == format_datetime('') == ''
+
+
+def test_format_datetime_in_user_timezone(app):
+    # stored in UTC (the testing TIMEZONE), shown in the tz cookie's zone
+    value = datetime(2026, 1, 1, 20)
+    with app.test_request_context(headers={'Cookie': 'tz=America/Chicago'}):
+        assert format_datetime(value, 'full') == 'Thursday January, 1, 2026 at 2:00PM'
+        assert format_datetime(value.replace(tzinfo=timezone.utc), 'full') == \
+            'Thursday January, 1, 2026 at 2:00PM'
+        # the calendar's labels
+        assert format_datetime(value, 'full', convert=False) == 'Thursday January, 1, 2026 at 8:00PM'
+    with app.test_request_context(headers={'Cookie': 'tz=Nowhere/Special'}):
+        assert format_datetime(value, 'full') == 'Thursday January, 1, 2026 at 8:00PM'
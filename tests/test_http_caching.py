@@ -0,0 +1,40 @@
+from cli import capture_statements
+from models import Artist, Show, db
+
+
+def revalidate(client, path, response):
+    return client.get(path, headers={'If-None-Match': response.headers['ETag']})
+
+
+def test_detail_page_not_modified_in_one_statement(app, client, seeded):
+    first = client.get('/venues/1')
+    responses = []
+    with app.app_context():
+        statements = capture_statements(lambda: responses.append(revalidate(client, '/venues/1', first)))
+    assert responses[0].status_code == 304
+    assert len(statements) == 1
+
+
+def test_detail_page_changes_with_its_shows_and_artists(app, client, seeded):
+    for path, change in (
+            ('/venues/1', lambda: db.session.delete(Show.query.filter_by(venue_id=1).first())),
+            ('/artists/1', lambda: setattr(db.session.get(Artist, 1), 'name', 'The Velvet Jazz Trio'))):
+        first = client.get(path)
+        assert revalidate(client, path, first).status_code == 304
+        with app.app_context():
+            change()
+            db.session.commit()
+        assert revalidate(client, path, first).status_code == 200
+
+
+def test_missing_detail_page(client, seeded):
+    assert client.get('/venues/999').status_code == 404
+    assert client.get('/artists/999').status_code == 404
+
+
+def test_no_last_modified(client, seeded):
+    # If-Modified-Since alone can't be answered with a 304
+    for path in ('/venues', '/venues/1', '/artists', '/artists/1', '/shows'):
+        response = client.get(path)
+        assert 'Last-Modified' not in response.headers
+        assert client.get(path, headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'}).status_code == 200
@@ -0,0 +1,157 @@
+import logging
+
+import pytest
+
+import jobs
+from jobs import JobQueue
+from models import Job, db
+
+
+@pytest.fixture
+def queue(app):
+    # a queue of its own, with tasks that record what they ran
+    queue = JobQueue()
+    queue.ran = []
+
+    @queue.task('record')
+    def record(n):
+        queue.ran.append(n)
+
+    @queue.task('fail')
+    def fail():
+        raise RuntimeError('no venue')
+
+    with app.app_context():
+        db.session.execute(db.text('TRUNCATE job RESTART IDENTITY'))
+        db.session.commit()
+    return queue
+
+
+@pytest.fixture
+def other_connection(app):
+    # a second worker's transaction, alongside db.session's
+    with app.app_context():
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        yield connection
+        if transaction.is_active:
+            transaction.rollback()
+        connection.close()
+
+
+def expire_lock(connection, id):
+    # as if the job had run for longer than JOB_TIMEOUT
+    connection.execute(db.text("UPDATE job SET run_at = now() - interval '1 second' WHERE id = :id"), {'id': id})
+
+
+def test_enqueue_dedupes_on_key(app, queue):
+    with app.app_context():
+        for n in range(3):
+            queue.enqueue('record', {'n': n}, key='refresh')
+        queue.enqueue('record', {'n': 3})
+        db.session.commit()
+        queue.enqueue('record', {'n': 4}, key='refresh')
+        db.session.commit()
+        assert [(job.key, job.args) for job in Job.query.order_by(Job.id)] == \
+            [('refresh', {'n': 0}), (None, {'n': 3})]
+        with pytest.raises(ValueError):
+            queue.enqueue('nothing')
+
+
+def test_claim_skips_locked_jobs(app, queue, other_connection):
+    with app.app_context():
+        queue.enqueue('record', {'n': 1})
+        queue.enqueue('record', {'n': 2})
+        db.session.commit()
+    # another worker has claimed the first job and not committed yet
+    claimed = other_connection.execute(jobs.CLAIM, {'worker': 'other', 'timeout': 300}).first()
+    assert claimed.args == {'n': 1}
+    with app.app_context():
+        # fail rather than wait on its lock
+        db.session.execute(db.text("SET LOCAL lock_timeout = '2s'"))
+        assert queue.run_one('worker')
+        assert queue.ran == [2]
+        db.session.execute(db.text("SET LOCAL lock_timeout = '2s'"))
+        assert not queue.run_one('worker')
+
+
+def test_failed_job_retried_with_backoff(app, queue):
+    config = app.config
+    with app.app_context():
+        queue.enqueue('fail')
+        db.session.commit()
+        db.session.query(Job).update({'max_attempts': 2})
+        db.session.commit()
+        assert queue.run_one('worker')
+        job, wait = db.session.query(Job, db.func.extract('epoch', Job.run_at - db.func.now())).one()
+        assert (job.status, job.attempts, job.locked_by) == ('queued', 1, None)
+        assert 'RuntimeError: no venue' in job.last_error
+        assert config['JOB_BACKOFF'] / 2 - 1 <= wait <= config['JOB_BACKOFF']
+        # not due yet
+        assert not queue.run_one('worker')
+
+        db.session.query(Job).update({'run_at': db.func.now()}, synchronize_session=False)
+        db.session.commit()
+        assert queue.run_one('worker')
+        job = Job.query.one()
+        assert (job.status, job.attempts) == ('failed', 2)
+
+
+def test_retry_delay_doubles_up_to_the_cap():
+    for attempts, delay in ((1, 10), (2, 20), (3, 40), (10, 60)):
+        for _ in range(20):
+            assert delay / 2 <= jobs.retry_delay(attempts, 10, 60) <= delay
+
+
+def test_expired_last_attempt_fails(app, queue, other_connection):
+    with app.app_context():
+        queue.enqueue('record', {'n': 1})
+        db.session.query(Job).update({'max_attempts': 1})
+        db.session.commit()
+    # a worker claimed it and died
+    other_connection.execute(jobs.CLAIM, {'worker': 'other', 'timeout': 300})
+    expire_lock(other_connection, 1)
+    other_connection.get_transaction().commit()
+    with app.app_context():
+        assert not queue.run_one('worker')
+        job = Job.query.one()
+        assert (job.status, job.attempts) == ('failed', 1)
+        assert job.last_error == 'worker other stopped or timed out while running the job'
+    assert queue.ran == []
+
+
+def test_done_after_expiry(app, queue, caplog):
+    # the job outlasts its lock on its last attempt, and another worker fails
+    # it while it is still running; it finishes after all
+    @queue.task('slow')
+    def slow():
+        with db.engine.begin() as connection:
+            expire_lock(connection, 1)
+            assert connection.execute(jobs.EXPIRE).first().id == 1
+
+    with app.app_context():
+        queue.enqueue('slow')
+        db.session.query(Job).update({'max_attempts': 1})
+        db.session.commit()
+        with caplog.at_level(logging.INFO):
+            assert queue.run_one('worker')
+        assert Job.query.count() == 0
+    assert 'done after it was marked failed' in caplog.text
+
+
+def test_done_after_claimed_again(app, queue, caplog):
+    # the job outlasts its lock and another worker claims it to run again
+    @queue.task('slow')
+    def slow():
+        with db.engine.begin() as connection:
+            expire_lock(connection, 1)
+            assert connection.execute(jobs.CLAIM, {'worker': 'other', 'timeout': 300}).first().id == 1
+
+    with app.app_context():
+        queue.enqueue('slow')
+        db.session.commit()
+        with caplog.at_level(logging.INFO):
+            assert queue.run_one('worker')
+        job = Job.query.one()
+        assert (job.status, job.attempts, job.locked_by) == ('queued', 2, 'other')
+    assert 'done after its lock ran out and another worker claimed it' in caplog.text
@@ -0,0 +1,55 @@
+import pytest
+
+import queries
+from models import Artist, Venue, db
+
+
+@pytest.fixture
+def other_connection(app):
+    # a second session's transaction, alongside db.session's
+    with app.app_context():
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        # fail rather than wait on a lock
+        connection.exec_driver_sql("SET LOCAL lock_timeout = '2s'")
+        yield connection
+        if transaction.is_active:
+            transaction.rollback()
+        connection.close()
+
+
+def insert_artist(connection, name):
+    connection.execute(db.text("INSERT INTO artist (name, seeking_venue) VALUES (:name, false)"), {'name': name})
+
+
+def test_one_bump_per_committed_transaction(app, seeded):
+    with app.app_context():
+        before = queries.table_version(Artist), queries.table_version(Venue)
+        db.session.add_all([Artist(name='The Wild Sax Band'), Artist(name='Guns N Petals')])
+        db.session.flush()
+        db.session.get(Artist, 1).name = 'Matt Quevedo'
+        db.session.flush()
+        db.session.commit()
+        assert (queries.table_version(Artist), queries.table_version(Venue)) == (before[0] + 1, before[1])
+
+        db.session.add(Artist(name='The Dueling Pianos'))
+        db.session.flush()
+        db.session.rollback()
+        assert queries.table_version(Artist) == before[0] + 1
+
+
+def test_writers_dont_wait_on_each_other(app, seeded, other_connection):
+    with app.app_context():
+        version = queries.table_version(Artist)
+        db.session.commit()
+        insert_artist(other_connection, 'The Wild Sax Band')
+        # the other transaction has written to artist and is still open
+        db.session.add(Artist(name='Guns N Petals'))
+        db.session.commit()
+        assert queries.table_version(Artist) == version + 1
+        db.session.commit()
+
+    insert_artist(other_connection, 'Matt Quevedo')
+    other_connection.get_transaction().commit()
+    with app.app_context():
+        assert queries.table_version(Artist) == version + 2
@@ -0,0 +1,96 @@
+import pytest
+
+import queries
+from models import Artist, db
+from typeahead import PrefixIndex, typeahead
+
+ODD_NAMES = ('The  Velvet   Jazz Trio', ' the velvet jazz quartet', 'THE VELVET', 'The Velvet\tUnderground',
+    'The_Velvet', 'The%Velvet', 'Thé Velvet')
+PREFIXES = ('the velvet', 'THE  VELVET ', 'the velvet jazz t', 'the v', 'the_', 'the%', 'thé', 't')
+
+
+def names(prefix, limit=10):
+    return [row['name'] for row in typeahead.search(Artist, prefix, limit)]
+
+
+@pytest.fixture
+def index():
+    index = PrefixIndex(Artist)
+    for id, name in enumerate(('The Velvet', 'The Velvet Jazz', 'The Velvets', 'The Velvet Underground',
+            'The Vel', 'Thf', 'Tha', 'The Velvet\U0010fffe'), 1):
+        index.put(id, name)
+    return index
+
+
+def search(index, prefix, limit=10):
+    return [row['name'] for row in index.search(prefix, limit)]
+
+
+def test_prefix_bounds(index):
+    assert search(index, 'the velvet') == ['The Velvet', 'The Velvet Jazz', 'The Velvet Underground',
+        'The Velvets', 'The Velvet\U0010fffe']
+    assert search(index, 'THE   Velvet ') == search(index, 'the velvet')
+    assert search(index, 'the velvet', limit=2) == ['The Velvet', 'The Velvet Jazz']
+    assert search(index, 'the velvet ') == search(index, 'the velvet')
+    assert search(index, 'the vel') == ['The Vel'] + search(index, 'the velvet')
+    assert search(index, 'th') == ['Tha', 'The Vel', 'The Velvet', 'The Velvet Jazz', 'The Velvet Underground',
+        'The Velvets', 'The Velvet\U0010fffe', 'Thf']
+    assert search(index, 'thg') == []
+    assert search(index, 'the velvet\U0010ffff') == []
+
+
+def test_rename_and_delete(index):
+    index.put(2, 'Matt Quevedo')
+    assert 'The Velvet Jazz' not in search(index, 'the velvet')
+    assert search(index, 'matt') == ['Matt Quevedo']
+    index.remove(1)
+    index.remove(99)
+    assert search(index, 'the velvet') == ['The Velvet Underground', 'The Velvets', 'The Velvet\U0010fffe']
+
+
+def test_committed_changes_applied_in_place(app, seeded):
+    with app.app_context():
+        assert names('the velvet jazz 1') == ['The Velvet Jazz 1']
+        index = typeahead.indexes['artist']
+        built = index.entries
+
+        db.session.get(Artist, 2).name = 'Matt Quevedo'
+        db.session.commit()
+        assert index.entries is built
+        assert index.version == queries.table_version(Artist)
+        assert names('the velvet jazz 1') == []
+        assert names('matt') == ['Matt Quevedo']
+        db.session.delete(db.session.get(Artist, 3))
+        db.session.commit()
+        assert names('the velvet jazz 2') == []
+        assert index.entries is built
+
+
+def test_rebuilt_when_the_version_moves(app, seeded):
+    with app.app_context():
+        assert names('matt') == []
+        built = typeahead.indexes['artist'].entries
+        # a write the session doesn't see, as from another process
+        with db.engine.begin() as connection:
+            connection.execute(db.text("INSERT INTO artist (name, seeking_venue) VALUES ('Matt Quevedo', false)"))
+        assert names('matt') == ['Matt Quevedo']
+        assert typeahead.indexes['artist'].entries is not built
+
+
+def test_database_fallback_matches_memory(app, seeded):
+    with app.app_context():
+        db.session.add_all([Artist(name=name) for name in ODD_NAMES])
+        db.session.commit()
+        in_memory = {prefix: names(prefix) for prefix in PREFIXES}
+        assert not typeahead.indexes['artist'].too_big
+
+        max_entries, typeahead.max_entries = typeahead.max_entries, 5
+        typeahead.indexes['artist'].version = None
+        try:
+            assert {prefix: names(prefix) for prefix in PREFIXES} == in_memory
+            assert typeahead.indexes['artist'].too_big
+        finally:
+            typeahead.max_entries = max_entries
+            typeahead.indexes['artist'].version = None
+        assert in_memory['THE  VELVET '] == in_memory['the velvet']
+        assert 'The  Velvet   Jazz Trio' in in_memory['the velvet jazz t']
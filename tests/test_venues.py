@@ -0,0 +1,19 @@
+from cli import capture_statements
+
+
+def venues_statements(app, client):
+    # after a warm-up request, as in the view budgets
+    assert client.get('/venues').status_code == 200
+    with app.app_context():
+        return capture_statements(lambda: client.get('/venues').close())
+
+
+def test_venues_statements_dont_grow_with_venues(app, client, seed):
+    # the directory reads every venue with its upcoming show count in one
+    # query, however many venues there are
+    seed(venues=5, artists=5)
+    few = venues_statements(app, client)
+    seed(venues=50, artists=50)
+    many = venues_statements(app, client)
+    assert b'The Musical Hop 49' in client.get('/venues').data
+    assert len(many) == len(few)
@@ -0,0 +1,21 @@
+import pytest
+
+from benchmarks.views import views
+from cli import capture_statements
+
+# every page and API view with its statement budget, as in the view benchmark.
+# ids restart at 1 whenever the database is seeded
+VIEWS = views(venue_id=1, artist_id=1)
+
+
+@pytest.mark.parametrize('method, path, data, budget', [view[1:] for view in VIEWS],
+    ids=[view[0] for view in VIEWS])
+def test_statement_budget(app, client, seeded, method, path, data, budget):
+    # the first request also builds what is only built once (the typeahead index)
+    assert client.open(path, method=method, data=data).status_code == 200
+
+    responses = []
+    with app.app_context():
+        statements = capture_statements(lambda: responses.append(client.open(path, method=method, data=data)))
+    assert responses[0].status_code == 200
+    assert len(statements) <= budget, '\n\n'.join(statement for statement, _ in statements)
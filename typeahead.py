@@ -0,0 +1,155 @@
+import bisect
+import threading
+
+from sqlalchemy import event
+
+import queries
+from models import TableVersion, db, table_version_pending
+
+#----------------------------------------------------------------------------#
+# Typeahead
+#----------------------------------------------------------------------------#
+
+# Name-prefix lookups for the artist and venue pickers on the new-show form.
+#
+# Each table's names are kept in memory as a sorted list of (folded name, id,
+# name), so a prefix is two bisects away. The list is built on first use and
+# kept current from the session: artists and venues added, renamed or deleted
+# in a committed transaction are put into or taken out of it in place.
+#
+# Each list records the table_version (see models.py) it reflects, and every
+# lookup reads the table's current one, a primary key lookup. When it has moved
+# on without the list, another process or a write that bypassed the session
+# (bulk imports) changed the table, and the list is built again. Tables with
+# more than TYPEAHEAD_MAX_ENTRIES rows are not held in memory; their lookups go
+# to the name_fold(name) index instead, which folds names the same way (see
+# queries.fold), so a prefix matches the same names either way.
+
+DEFAULT_MAX_ENTRIES = 100000
+
+
+class PrefixIndex:
+    def __init__(self, model):
+        self.model = model
+        self.entries = []
+        self.by_id = {}
+        # the table_version the entries reflect; None until built
+        self.version = None
+        self.too_big = False
+        self.lock = threading.Lock()
+
+    def build(self, max_entries, version):
+        rows = db.session.query(self.model.id, self.model.name).limit(max_entries + 1).all()
+        with self.lock:
+            self.too_big = len(rows) > max_entries
+            self.entries = [] if self.too_big else sorted((queries.fold(name), id, name) for id, name in rows)
+            self.by_id = {entry[1]: entry for entry in self.entries}
+            self.version = version
+
+    def put(self, id, name):
+        with self.lock:
+            self._remove(id)
+            entry = (queries.fold(name), id, name)
+            bisect.insort(self.entries, entry)
+            self.by_id[id] = entry
+
+    def remove(self, id):
+        with self.lock:
+            self._remove(id)
+
+    def _remove(self, id):
+        entry = self.by_id.pop(id, None)
+        if entry is not None:
+            del self.entries[bisect.bisect_left(self.entries, entry)]
+
+    def search(self, prefix, limit):
+        key = queries.fold(prefix)
+        with self.lock:
+            start = bisect.bisect_left(self.entries, (key,))
+            # every name starting with key sorts before key + the highest code point
+            end = bisect.bisect_left(self.entries, (key + '\U0010ffff',), start)
+            return [{'id': id, 'name': name} for _, id, name in self.entries[start:min(end, start + limit)]]
+
+
+class Typeahead:
+    def __init__(self):
+        self.indexes = {}
+        self.max_entries = DEFAULT_MAX_ENTRIES
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('TYPEAHEAD_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+        app.extensions['typeahead'] = self
+
+    def search(self, model, prefix, limit=10):
+        # up to limit {'id', 'name'} whose name starts with prefix, ordered by name
+        index = self.indexes[model.__tablename__]
+        version = queries.table_version(model)
+        if index.version != version:
+            index.build(self.max_entries, version)
+        if index.too_big:
+            return queries.name_prefix(model, prefix, limit)
+        return index.search(prefix, limit)
+
+    def watch(self, session, models):
+        # keep the indexes of models in step with what the session commits
+        for model in models:
+            self.indexes.setdefault(model.__tablename__, PrefixIndex(model))
+        if event.contains(session, 'after_commit', self.after_commit):
+            return
+        event.listen(session, 'after_flush', self.after_flush)
+        event.listen(session, 'before_commit', self.before_commit)
+        event.listen(session, 'after_commit', self.after_commit)
+        event.listen(session, 'after_rollback', self.after_rollback)
+
+    def after_flush(self, session, flush_context):
+        changes = session.info.setdefault('typeahead_changes', {})
+        for instance in (*session.new, *session.dirty):
+            if getattr(instance, '__tablename__', None) in self.indexes:
+                changes[instance.__tablename__, instance.id] = instance.name
+        for instance in session.deleted:
+            if getattr(instance, '__tablename__', None) in self.indexes:
+                changes[instance.__tablename__, instance.id] = None
+
+    def before_commit(self, session):
+        # the versions of the tables this transaction wrote to, before and
+        # after it. they are bumped as it commits (see TableVersion); bumping
+        # them now instead, with SET CONSTRAINTS, locks their rows until the
+        # commit, so the version before is the one after less one. if an index
+        # is at that version when the commit lands, only this transaction's
+        # changes are missing from it
+        session.flush()
+        if not session.info.get('typeahead_changes'):
+            return
+        tables = session.query(table_version_pending.c.table_name).filter(
+            table_version_pending.c.txid == db.func.txid_current(),
+            table_version_pending.c.table_name.in_(list(self.indexes))).all()
+        if not tables:
+            return
+        session.execute(db.text('SET CONSTRAINTS table_version_pending_commit IMMEDIATE'))
+        session.info['typeahead_versions'] = {table: (version - 1, version)
+            for table, version in session.query(TableVersion.table_name, TableVersion.version
+                ).filter(TableVersion.table_name.in_([table for table, in tables]))}
+
+    def after_commit(self, session):
+        changes = session.info.pop('typeahead_changes', {})
+        versions = session.info.pop('typeahead_versions', {})
+        for table, (before, after) in versions.items():
+            index = self.indexes[table]
+            # otherwise the next lookup sees the version has moved and builds it again
+            if index.version != before or index.too_big:
+                continue
+            for (changed_table, id), name in changes.items():
+                if changed_table != table:
+                    continue
+                if name is None:
+                    index.remove(id)
+                else:
+                    index.put(id, name)
+            index.version = after
+
+    def after_rollback(self, session):
+        session.info.pop('typeahead_changes', None)
+        session.info.pop('typeahead_versions', None)
+
+
+typeahead = Typeahead()
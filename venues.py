@@ -0,0 +1,170 @@
+import traceback
+
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort
+
+import queries
+from http_caching import conditional
+from models import Venue, Show, VenueShowCounts, db
+
+#----------------------------------------------------------------------------#
+# Venues
+#----------------------------------------------------------------------------#
+
+bp = Blueprint('venues', __name__)
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@bp.route('/venues')
+def venues():
+    # areas, venues and num_upcoming_shows come back from a single grouped query
+    return conditional(queries.list_freshness(Venue, Show, VenueShowCounts),
+        lambda: render_template('pages/venues.html', areas=queries.venue_areas()))
+
+@bp.route('/venues/search', methods=['POST'])
+def search_venues():
+    # ranked search on venue name, genres, city and state, done in the database
+    response = queries.search_venues(request.form.get('search_term', ''),
+        page=max(1, request.form.get('page', 1, type=int)))
+    return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+
+@bp.route('/venues/<int:venue_id>')
+def show_venue(venue_id):
+    # shows the venue page with the given venue_id
+    freshness = queries.venue_freshness(venue_id)
+    if freshness is None:
+        abort(404)
+
+    past_page = max(1, request.args.get('past_page', 1, type=int))
+    return conditional(freshness, lambda: render_template('pages/show_venue.html',
+        venue=queries.venue_detail(venue_id, past_page=past_page)))
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/create', methods=['GET', 'POST'])
+def create_venue_form():
+    try:
+        if request.method == 'GET':
+            from forms import VenueForm
+            form = VenueForm()
+            return render_template('forms/new_venue.html', form=form)
+        elif request.method == 'POST':
+            name = request.form.get('name')
+            city = request.form.get('city')
+            state = request.form.get('state')
+            address = request.form.get('address')
+            phone = request.form.get('phone')
+            genres = request.form.getlist('genres')
+            fb = request.form.get('facebook_link')
+            img = request.form.get('image_link')
+
+            if request.form.get('seeking_talent') == 'y':
+                seeking_talent = True
+            else:
+                seeking_talent=False
+
+            seeking_description = request.form.get('seeking_description')
+            website = request.form.get('website_link')
+
+            venue_info = Venue(name=name, city=city, state=state, address=address,
+            genres=genres, image_link=img, seeking_talent=seeking_talent,
+            seeking_description=seeking_description, phone=phone, facebook_link=fb, website=website)
+
+            db.session.add(venue_info)
+            db.session.commit()
+
+          # on successful db insert, flash success
+            flash(f"{request.form['name']} was successfully listed!")
+      # TODO: on unsuccessful db insert, flash an error instead.
+    except Exception as e:
+        traceback.print_exc()
+        db.session.rollback()
+        if e.orig.pgcode:
+            if e.orig.pgcode == '23505': # psycopg2 UniqueViolation
+                flash('An error occurred during listing. Phone number already in records.')
+            else:
+                flash('An error occurred during listing')
+        else:
+            flash('An error occurred during listing')
+
+    # TODO: insert form data as a new Venue record in the db, instead
+    # TODO: modify data to be the data object returned from db insertion
+
+    return render_template('pages/home.html')
+
+@bp.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  # TODO: Complete this endpoint for taking a venue_id, and using
+  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+    try:
+        venue = Venue.query.get(venue_id)
+        if venue:
+            v = venue.name
+            db.session.delete(venue)
+            db.session.commit()
+            flash(f'{v} successfully deleted')
+        else:
+            flash(f'Venue with id {venue_id} does not exist')
+    except:
+        traceback.print_exc()
+        flash('An error occured. Unable to delete Venue')
+
+    # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+    # clicking that button delete it from the db then redirect the user to the homepage
+    return render_template('pages/home.html')
+
+#  Update
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+    from forms import VenueForm
+    form = VenueForm()
+    venue = Venue.query.get(venue_id)
+
+    form.name.data = venue.name
+    form.city.data = venue.city
+    form.state.data = venue.state
+    form.address.data = venue.address
+    form.genres.data = venue.genres
+    form.phone.data = venue.phone
+    form.facebook_link.data = venue.facebook_link
+    form.website_link.data = venue.website
+    form.image_link.data = venue.image_link
+    form.seeking_talent.data = venue.seeking_talent
+    form.seeking_description.data = venue.seeking_description
+
+    # TODO: populate form with values from venue with ID <venue_id>
+    return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+    # TODO: take values from the form submitted, and update existing
+    # venue record with ID <venue_id> using the new attributes
+    try:
+        venue = Venue.query.get(venue_id)
+        venue.name = request.form['name']
+        venue.city = request.form['city']
+        venue.state= request.form['state']
+        venue.address = request.form.get('address')
+        venue.genres = request.form.getlist('genres')
+        venue.image_link = request.form.get('image_link')
+
+        if request.form.get('seeking_talent') == 'y':
+            venue.seeking_talent = True
+        else:
+            venue.seeking_talent = False
+
+        venue.seeking_description = request.form.get('seeking_description')
+        venue.facebook_link = request.form.get('facebook_link')
+        venue.phone = request.form.get('phone')
+        venue.website = request.form.get('website_link')
+
+        db.session.commit()
+        flash(f'Edit on {venue.name} was successful')
+    except:
+        traceback.print_exc()
+        flash(f'An error occured during editing of {venue.name}')
+
+    return redirect(url_for('venues.show_venue', venue_id=venue_id))